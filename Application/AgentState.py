@@ -0,0 +1,266 @@
+import numpy as np
+
+CONDITIONS = ("susceptible", "infectious", "removed")
+SUSCEPTIBLE, INFECTIOUS, REMOVED = range(0, len(CONDITIONS))
+FINANCIAL_STATUSES = ("none", "minor", "intermediate", "major", "critical", "bust")
+
+
+def classify_financial_impact(impact):
+    """
+    Word description of financial impacts, as assigned by
+    Graph.update_visual_attributes.
+
+    Args:
+        impact (ndarray):
+            financial impacts
+
+    Returns:
+        statuses (ndarray):
+            financial status of each impact
+    """
+    impact = np.asarray(impact, dtype=np.float64)
+    return np.select(
+        [
+            impact == 1.0,
+            (impact < 1.0) & (impact >= 0.75),
+            (impact < 0.75) & (impact >= 0.5),
+            (impact < 0.5) & (impact >= 0.25),
+            (impact < 0.25) & (impact >= 0.0),
+        ],
+        FINANCIAL_STATUSES[:-1],
+        FINANCIAL_STATUSES[-1],
+    )
+
+
+# Node colours of each condition, as drawn by Graph.update_visual_attributes
+CONDITION_COLOURS = ("#00FF00", "#FF0000", "#3A3B3C")
+FINANCIAL_INDICATORS = (1.0, 0.9, 0.8, 0.7, 0.6, 0.5, 0.25)
+
+
+def financial_indicator_levels(impact):
+    """
+    Index into FINANCIAL_INDICATORS of the alpha given to each financial
+    impact by Graph.update_visual_attributes.
+
+    Args:
+        impact (ndarray):
+            financial impacts
+
+    Returns:
+        levels (ndarray):
+            index of each impact's alpha
+    """
+    impact = np.asarray(impact, dtype=np.float64)
+    return np.select(
+        [
+            impact == 1.0,
+            (impact < 1.0) & (impact >= 0.8),
+            (impact < 0.8) & (impact >= 0.6),
+            (impact < 0.6) & (impact >= 0.4),
+            (impact < 0.4) & (impact >= 0.2),
+            (impact < 0.2) & (impact >= 0.0),
+        ],
+        range(0, len(FINANCIAL_INDICATORS) - 1),
+        len(FINANCIAL_INDICATORS) - 1,
+    )
+
+
+def blended_node_colours(condition, financial_impact, background: str = "#FFFFFF"):
+    """
+    Colour of each agent's node blended at its financial indicator alpha
+    over the background, for drawing surfaces without alpha (e.g. a Tk
+    canvas).
+
+    Args:
+        condition (ndarray):
+            condition code of each agent
+        financial_impact (ndarray):
+            financial impact of each agent
+        background (str):
+            hex colour the nodes are drawn over
+
+    Returns:
+        colours (ndarray):
+            hex colour of each agent
+    """
+    def rgb(colour):
+        return np.array([int(colour[index : index + 2], 16) for index in (1, 3, 5)])
+
+    table = np.array(
+        [
+            "#%02X%02X%02X"
+            % tuple(np.round(alpha * rgb(colour) + (1 - alpha) * rgb(background)).astype(int))
+            for colour in CONDITION_COLOURS
+            for alpha in FINANCIAL_INDICATORS
+        ]
+    )
+    levels = financial_indicator_levels(financial_impact)
+    return table[np.asarray(condition) * len(FINANCIAL_INDICATORS) + levels]
+
+
+class AgentState:
+    """
+    Columnar (structure of arrays) store of agent state, shared by the
+    pandemic and financial graphs and indexed by node.
+
+    Attributes
+    ----------
+    condition : ndarray
+        condition code of each agent, indexing into CONDITIONS
+    time_exposed : ndarray
+        number of iterations each agent has been infectious for
+    able_to_recover : ndarray
+        whether each agent may still increment time_exposed this iteration
+    initial_asset_value : ndarray
+        asset value of each agent at the start of the model
+    current_asset_value : ndarray
+        asset value of each agent after the latest iteration
+    financial_impact : ndarray
+        current_asset_value as a fraction of initial_asset_value
+    revision : int
+        counter incremented every time agents are modified
+    modified : ndarray
+        revision at which each agent was last modified
+
+    Methods
+    -------
+    mark_modified(nodes):
+        Records that the given agents have changed.
+
+    modified_since(revision):
+        Agents modified after the given revision.
+
+    condition_names():
+        Condition of each agent as a word, rather than a code.
+
+    financial_status():
+        Word description of each agent's financial impact.
+
+    node_attributes(nodes):
+        Attributes of the given agents as a dict_of_dicts
+        for ingestion into model graphs.
+
+    count(attribute):
+        Sorted (value, count) pairs of an agent attribute.
+    """
+
+    def __init__(self, agents):
+        """
+        Constructs the agent state arrays from an agent population.
+
+        Args:
+            agents (DataFrame):
+                population of agents, as created by AgentPopulation
+        """
+        codes = {condition: code for code, condition in enumerate(CONDITIONS)}
+        self.condition = agents["condition"].map(codes).to_numpy(dtype=np.int8, copy=True)
+        self.time_exposed = agents["time_exposed"].to_numpy(dtype=np.int64, copy=True)
+        self.able_to_recover = np.zeros(len(agents.index), dtype=bool)
+        self.initial_asset_value = agents["initial_asset_value"].to_numpy(dtype=np.float64, copy=True)
+        self.current_asset_value = agents["current_asset_value"].to_numpy(dtype=np.float64, copy=True)
+        self.financial_impact = agents["financial_impact"].to_numpy(dtype=np.float64, copy=True)
+        self.revision = 0
+        self.modified = np.zeros(len(agents.index), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.condition)
+
+    def mark_modified(self, nodes):
+        """
+        Records that the given agents have changed.
+
+        Args:
+            nodes (ndarray):
+                indices of modified agents
+        """
+        self.revision += 1
+        self.modified[nodes] = self.revision
+
+    def modified_since(self, revision):
+        """
+        Agents modified after the given revision.
+
+        Args:
+            revision (int):
+                revision to compare against
+
+        Returns:
+            nodes (ndarray):
+                indices of agents modified since revision
+        """
+        return np.flatnonzero(self.modified > revision)
+
+    def condition_names(self):
+        """
+        Condition of each agent as a word, rather than a code.
+
+        Returns:
+            conditions (ndarray):
+                condition of each agent
+        """
+        return np.array(CONDITIONS)[self.condition]
+
+    def financial_status(self):
+        """
+        Word description of each agent's financial impact.
+
+        Returns:
+            statuses (ndarray):
+                financial status of each agent
+        """
+        return classify_financial_impact(self.financial_impact)
+
+    def node_attributes(self, nodes):
+        """
+        Attributes of the given agents as a dict_of_dicts
+        for ingestion into model graphs.
+
+        Args:
+            nodes (ndarray):
+                indices of agents
+
+        Returns:
+            attributes (dict):
+                node attribute dicts keyed by node
+        """
+        return {
+            node: {
+                "condition": CONDITIONS[code],
+                "time_exposed": exposure,
+                "able_to_recover": able,
+                "initial_asset_value": initial,
+                "current_asset_value": current,
+                "financial_impact": impact,
+            }
+            for node, code, exposure, able, initial, current, impact in zip(
+                nodes.tolist(),
+                self.condition[nodes].tolist(),
+                self.time_exposed[nodes].tolist(),
+                self.able_to_recover[nodes].tolist(),
+                self.initial_asset_value[nodes].tolist(),
+                self.current_asset_value[nodes].tolist(),
+                self.financial_impact[nodes].tolist(),
+            )
+        }
+
+    def count(self, attribute):
+        """
+        Sorted (value, count) pairs of an agent attribute,
+        in the form returned by Model.sum_agent_attributes.
+
+        Args:
+            attribute (str):
+                name of the agent attribute, or 'financial_status'
+
+        Returns:
+            counts (list):
+                (value, count) tuples sorted by value
+        """
+        if attribute == "condition":
+            values = self.condition_names()
+        elif attribute == "financial_status":
+            values = self.financial_status()
+        else:
+            values = getattr(self, attribute)
+        unique_values, counts = np.unique(values, return_counts=True)
+        return list(zip(unique_values.tolist(), counts.tolist()))
@@ -0,0 +1,434 @@
+import abc
+import collections
+import math
+import os
+import struct
+import zlib
+import numpy as np
+import PIL.GifImagePlugin
+import PIL.Image
+
+
+class AnimationWriter(abc.ABC):
+    """
+    Animation encoded a frame at a time.
+
+    Each appended frame is held back until the next one arrives, so a run of
+    identical frames is written once with their durations summed. At most
+    one frame is kept in memory, and the file is complete as soon as the
+    writer is closed after the last frame.
+
+    Attributes
+    ----------
+    path : str
+        output file path
+    duration : int
+        display time of each appended frame, in milliseconds
+    frames_written : int
+        number of distinct frames written so far
+
+    Methods
+    -------
+    append(image):
+        Adds a frame to the animation.
+
+    close():
+        Writes the held frame and finishes the file.
+    """
+
+    def __init__(self, path: str, duration: int = 600, loop: int = 0):
+        """
+        Constructs essential attributes for the writer.
+
+        Args:
+            path (str):
+                output file path
+            duration (int):
+                display time of each appended frame, in milliseconds
+            loop (int):
+                number of times the animation plays, 0 to repeat forever
+        """
+        self.path = path
+        self.duration = duration
+        self.loop = loop
+        self.file = None
+        self.frames_written = 0
+        self.held_frame = None
+        self.held_duration = 0
+
+    def append(self, image):
+        """
+        Adds a frame to the animation.
+
+        Args:
+            image (Image):
+                frame, of the same size as the first
+        """
+        frame = self.prepare(image)
+        if self.held_frame is not None:
+            if frame.tobytes() == self.held_frame.tobytes():
+                self.held_duration += self.duration
+                return
+            self.write_held_frame()
+        self.held_frame = frame
+        self.held_duration = self.duration
+
+    def write_held_frame(self):
+        if self.file is None:
+            self.file = open(self.path, "wb")
+            self.write_header(self.held_frame)
+        self.write_frame(self.held_frame, self.held_duration)
+        self.frames_written += 1
+        self.held_frame = None
+
+    def close(self):
+        """
+        Writes the held frame and finishes the file.
+        """
+        if self.held_frame is not None:
+            self.write_held_frame()
+        if self.file is not None:
+            self.write_trailer()
+            self.file.close()
+            self.file = None
+
+    def prepare(self, image):
+        return image.convert("RGB")
+
+    @abc.abstractmethod
+    def write_header(self, frame):
+        # Opens the format, sized to the first frame, in self.file
+        pass
+
+    @abc.abstractmethod
+    def write_frame(self, frame, duration):
+        # Encodes a frame shown for duration milliseconds
+        pass
+
+    @abc.abstractmethod
+    def write_trailer(self):
+        # Finishes the format, before the file is closed
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class GifWriter(AnimationWriter):
+    """
+    Animated GIF written a frame at a time with a single global palette.
+
+    The palette is fitted to the first frame plus any reserved colours,
+    e.g. the model's condition colours that only appear later in a run,
+    and every frame is mapped onto it without dithering. After the first
+    frame only the rectangle that changed since the previous one is
+    encoded, drawn over it.
+    """
+
+    def __init__(self, path: str, duration: int = 600, loop: int = 0, reserved_colours=()):
+        """
+        Constructs essential attributes for the writer.
+
+        Args:
+            path (str):
+                output file path
+            duration (int):
+                display time of each appended frame, in milliseconds
+            loop (int):
+                number of times the animation plays, 0 to repeat forever
+            reserved_colours (iterable):
+                hex colours always included in the palette
+        """
+        super().__init__(path, duration, loop)
+        self.reserved_colours = list(reserved_colours)
+        self.palette = None
+        self.previous_frame = None
+
+    def prepare(self, image):
+        frame = image.convert("RGB")
+        if self.palette is None:
+            self.palette = self.create_palette(frame)
+        return frame.quantize(palette=self.palette, dither=PIL.Image.NONE)
+
+    def create_palette(self, frame):
+        reserved = [
+            int(colour[index : index + 2], 16)
+            for colour in self.reserved_colours
+            for index in (1, 3, 5)
+        ]
+        fitted = frame.quantize(colors=256 - len(self.reserved_colours))
+        colours = fitted.getpalette()[: 3 * (256 - len(self.reserved_colours))]
+        palette = PIL.Image.new("P", (1, 1))
+        palette.putpalette(colours + reserved + [0] * (768 - len(colours) - len(reserved)))
+        return palette
+
+    def write_header(self, frame):
+        header, _ = PIL.GifImagePlugin.getheader(frame, info={"loop": self.loop})
+        for chunk in header:
+            self.file.write(chunk)
+
+    def write_frame(self, frame, duration):
+        pixels = np.asarray(frame)
+        offset = (0, 0)
+        if self.previous_frame is not None:
+            changed = pixels != self.previous_frame
+            rows, columns = np.flatnonzero(changed.any(axis=1)), np.flatnonzero(changed.any(axis=0))
+            if len(rows):
+                offset = (int(columns[0]), int(rows[0]))
+                frame = frame.crop((columns[0], rows[0], columns[-1] + 1, rows[-1] + 1))
+            else:
+                offset, frame = (0, 0), frame.crop((0, 0, 1, 1))
+        self.previous_frame = pixels
+        # Disposal 1 leaves the previous frame in place under the changed rectangle
+        for chunk in PIL.GifImagePlugin.getdata(frame, offset=offset, duration=duration, disposal=1):
+            self.file.write(chunk)
+
+    def write_trailer(self):
+        self.file.write(b";")
+
+
+class ApngWriter(AnimationWriter):
+    """
+    Animated PNG written a frame at a time, in full colour.
+
+    Scanlines use the PNG 'Up' filter, applied to the whole frame at once.
+    The frame count in the acTL chunk is patched in when the file is closed.
+    """
+
+    signature = b"\x89PNG\r\n\x1a\n"
+
+    def write_chunk(self, chunk_type, data):
+        self.file.write(struct.pack(">I", len(data)))
+        self.file.write(chunk_type + data)
+        self.file.write(struct.pack(">I", zlib.crc32(chunk_type + data)))
+
+    def write_header(self, frame):
+        self.width, self.height = frame.size
+        self.sequence_number = 0
+        self.file.write(self.signature)
+        self.write_chunk(b"IHDR", struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0))
+        self.animation_control_offset = self.file.tell()
+        self.write_chunk(b"acTL", struct.pack(">II", 0, self.loop))
+
+    def write_frame(self, frame, duration):
+        # Delays are stored in hundredths of a second, within 16 bits
+        delay = min(int(round(duration / 10)), 65535)
+        self.write_chunk(
+            b"fcTL",
+            struct.pack(
+                ">IIIIIHHBB", self.sequence_number, self.width, self.height, 0, 0, delay, 100, 0, 0
+            ),
+        )
+        self.sequence_number += 1
+
+        pixels = np.asarray(frame, dtype=np.uint8).reshape(self.height, self.width * 3)
+        filtered = np.empty((self.height, self.width * 3 + 1), dtype=np.uint8)
+        filtered[:, 0] = 2
+        filtered[0, 1:] = pixels[0]
+        np.subtract(pixels[1:], pixels[:-1], out=filtered[1:, 1:])
+        data = zlib.compress(filtered.tobytes(), 6)
+
+        if self.frames_written == 0:
+            self.write_chunk(b"IDAT", data)
+        else:
+            self.write_chunk(b"fdAT", struct.pack(">I", self.sequence_number) + data)
+            self.sequence_number += 1
+
+    def write_trailer(self):
+        self.write_chunk(b"IEND", b"")
+        end = self.file.tell()
+        self.file.seek(self.animation_control_offset)
+        self.write_chunk(b"acTL", struct.pack(">II", self.frames_written, self.loop))
+        self.file.seek(end)
+
+
+class ContactSheet:
+    """
+    Overview grid of a run's frames, kept within a pixel budget per sheet.
+
+    Frames are pasted in as they arrive, downsampled so that a sheet of all
+    of them fits in pixel_budget pixels, though never below min_scale of
+    their size. When even that is too many, evenly spaced frames (always
+    including the first and last) are kept, or with pages the frames are
+    spread over several sheets: grid.png, grid-2.png, ... Only the sheet
+    being filled is held in memory, however long the run.
+
+    Attributes
+    ----------
+    path : str
+        PNG file path of the first sheet
+    total_frames : int
+        number of frames that will be appended
+    columns : int
+        frames per row
+    pixel_budget : int
+        maximum number of pixels per sheet
+    """
+
+    def __init__(
+        self,
+        path: str,
+        total_frames: int,
+        columns: int = 3,
+        pixel_budget: int = 4096 * 4096,
+        min_scale: float = 0.25,
+        pages: bool = False,
+    ):
+        """
+        Constructs essential attributes for the ContactSheet object.
+
+        Args:
+            path (str):
+                PNG file path of the first sheet
+            total_frames (int):
+                number of frames that will be appended
+            columns (int):
+                frames per row
+            pixel_budget (int):
+                maximum number of pixels per sheet
+            min_scale (float):
+                smallest size of a tile relative to its frame
+            pages (bool):
+                whether frames that do not fit are put on further sheets
+                rather than skipped
+        """
+        self.path = path
+        self.total_frames = total_frames
+        self.columns = columns
+        self.pixel_budget = pixel_budget
+        self.min_scale = min_scale
+        self.pages = pages
+        self.frames_seen = 0
+        self.sheet = None
+        self.sheets_written = 0
+
+    def tiles_per_sheet(self, tile_size):
+        tile_width, tile_height = tile_size
+        rows = self.pixel_budget // (self.columns * tile_width * tile_height)
+        return int(rows) * self.columns
+
+    def plan(self, frame_size):
+        # Picks the tile size, the frames to keep and how many go on a sheet
+        width, height = frame_size
+        rows = math.ceil(self.total_frames / self.columns)
+        scale = min(1.0, math.sqrt(self.pixel_budget / (self.columns * rows * width * height)))
+        scale = max(scale, self.min_scale)
+        self.tile_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        self.sheet_capacity = max(1, self.tiles_per_sheet(self.tile_size))
+
+        if self.pages or self.sheet_capacity >= self.total_frames:
+            self.selected = set(range(0, self.total_frames))
+        else:
+            self.selected = set(
+                np.round(np.linspace(0, self.total_frames - 1, self.sheet_capacity))
+                .astype(np.int64)
+                .tolist()
+            )
+        self.frames_left = len(self.selected)
+
+    def sheet_path(self):
+        if self.sheets_written == 0:
+            return self.path
+        root, extension = os.path.splitext(self.path)
+        return f"{root}-{self.sheets_written + 1}{extension}"
+
+    def append(self, image):
+        if self.frames_seen == 0:
+            self.plan(image.size)
+        frame_index = self.frames_seen
+        self.frames_seen += 1
+        if frame_index not in self.selected:
+            return
+
+        if self.sheet is None:
+            tiles = min(self.sheet_capacity, self.frames_left)
+            tile_width, tile_height = self.tile_size
+            self.sheet = PIL.Image.new(
+                "RGB",
+                size=(self.columns * tile_width, math.ceil(tiles / self.columns) * tile_height),
+                color="#FFFFFF",
+            )
+            self.tiles_pasted = 0
+
+        tile = image.convert("RGB")
+        if tile.size != self.tile_size:
+            tile = tile.resize(self.tile_size, PIL.Image.LANCZOS)
+        tile_width, tile_height = self.tile_size
+        box = (
+            (self.tiles_pasted % self.columns) * tile_width,
+            (self.tiles_pasted // self.columns) * tile_height,
+        )
+        self.sheet.paste(tile, box=box)
+        self.tiles_pasted += 1
+        self.frames_left -= 1
+        if self.tiles_pasted == self.sheet_capacity:
+            self.write_sheet()
+
+    def write_sheet(self):
+        self.sheet.save(fp=self.sheet_path(), format="PNG")
+        self.sheets_written += 1
+        self.sheet = None
+
+    def close(self):
+        if self.sheet is not None:
+            self.write_sheet()
+
+
+class FrameCollector:
+    """
+    Feeds exported frames to writers in order, as soon as their exports finish.
+
+    Frames can be exported out of order by render workers; each is opened,
+    appended to every writer and released once it and all earlier frames
+    have landed.
+
+    Methods
+    -------
+    add(future, path):
+        Queues an exported frame and appends every frame that is ready.
+
+    close():
+        Waits for the remaining frames and closes the writers.
+    """
+
+    def __init__(self, writers):
+        """
+        Args:
+            writers (list):
+                writers with append(image) and close(), e.g. GifWriter
+        """
+        self.writers = writers
+        self.pending = collections.deque()
+
+    def add(self, future, path):
+        """
+        Queues an exported frame and appends every frame that is ready.
+
+        Args:
+            future (Future):
+                export of the frame
+            path (str):
+                PNG file the frame is exported to
+        """
+        self.pending.append((future, path))
+        self.collect(wait=False)
+
+    def collect(self, wait):
+        while self.pending and (wait or self.pending[0][0].done()):
+            future, path = self.pending.popleft()
+            future.result()
+            with PIL.Image.open(path) as image:
+                for writer in self.writers:
+                    writer.append(image)
+
+    def close(self):
+        """
+        Waits for the remaining frames and closes the writers.
+        """
+        self.collect(wait=True)
+        for writer in self.writers:
+            writer.close()
@@ -0,0 +1,235 @@
+import argparse
+import json
+import time
+from pandas import DataFrame
+from AgentState import CONDITIONS, FINANCIAL_STATUSES
+from Checkpoint import Checkpoint, checkpoint_path
+from Ensemble import Ensemble, count_vectors
+from Model import Model
+from Sweep import SETTINGS, Sweep, default_summary_path, expand_grid
+
+# Same defaults as the GUI's input fields
+DEFAULT_OPTIONS = [
+    [1000, 30, "erdos_renyi", 15],
+    [0.001, 1, 0.66, 7],
+    [0.001, 1, 0.15, 5.0],
+]
+
+
+def positive_int(value):
+    # argparse type for counts that must be at least 1
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def grid_entry(value):
+    # argparse type for the values to sweep of a setting, as SETTING=V1,V2,...
+    setting, separator, values = value.partition("=")
+    if setting not in SETTINGS:
+        raise argparse.ArgumentTypeError(
+            f"unknown setting {setting!r}, choose from {', '.join(SETTINGS)}"
+        )
+    if not separator:
+        raise argparse.ArgumentTypeError(f"expected {setting}=V1,V2,..., got {value!r}")
+    data_type = SETTINGS[setting][2]
+    return setting, [data_type(value) for value in values.split(",")]
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the compound pandemic/financial model without the GUI."
+    )
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "ensemble", "sweep"])
+    parser.add_argument("--config", help="JSON file of settings (and a 'grid' for sweeps)")
+    parser.add_argument("--output-dir", default="output")
+    parser.add_argument("--engine", default="vectorized", choices=["networkx", "vectorized"])
+    parser.add_argument("--rng", default=None, choices=["legacy", "philox"])
+    parser.add_argument(
+        "--render",
+        action="store_true",
+        help="also produce network plots, GraphML and GIFs",
+    )
+    parser.add_argument(
+        "--renderer",
+        default="raster",
+        choices=["bokeh", "raster", "layered"],
+        help="draw network plots with matplotlib (layered caches the edges), "
+        "or with Bokeh (needs a browser)",
+    )
+    parser.add_argument(
+        "--apng", action="store_true", help="also encode animated PNGs of the network frames"
+    )
+    parser.add_argument(
+        "--grid-budget",
+        type=int,
+        default=4096 * 4096,
+        help="maximum pixels of each grid.png overview sheet",
+    )
+    parser.add_argument(
+        "--grid-pages",
+        action="store_true",
+        help="put frames beyond the grid budget on further sheets instead of thinning them",
+    )
+    parser.add_argument(
+        "--stats-format",
+        choices=("csv", "store", "both"),
+        default="csv",
+        help="write agent state as per-cycle CSVs, a columnar run store of every iteration, or both",
+    )
+    parser.add_argument(
+        "--graph-format",
+        choices=("graphml", "delta"),
+        default="delta",
+        help="graphs of rendered frames as GraphML files, or a topology written once plus attribute deltas",
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=0,
+        metavar="CYCLES",
+        help="save a checkpoint of the run every this many cycles, 0 for none",
+    )
+    parser.add_argument(
+        "--resume",
+        default=None,
+        metavar="RUN_DIR",
+        help="continue the run in RUN_DIR from its latest checkpoint, with its settings",
+    )
+    parser.add_argument(
+        "--layout-cache",
+        default=None,
+        help="directory node positions are cached in, defaults to <output-dir>/layouts",
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--replicates", type=positive_int, default=100)
+    parser.add_argument("--representative", action="store_true")
+    parser.add_argument(
+        "--grid",
+        action="append",
+        type=grid_entry,
+        default=[],
+        metavar="SETTING=V1,V2,...",
+        help="values to sweep for a setting, may be repeated",
+    )
+    parser.add_argument("--summary", default=None, help="summary CSV of a sweep")
+    for setting, (_, _, data_type) in SETTINGS.items():
+        parser.add_argument(f"--{setting.replace('_', '-')}", dest=setting, type=data_type)
+    return parser.parse_args(argv)
+
+
+def compose_options(arguments):
+    # Defaults, overridden by the config file, overridden by flags
+    options = [list(option_list) for option_list in DEFAULT_OPTIONS]
+    config = {}
+    if arguments.config:
+        with open(arguments.config) as config_file:
+            config = json.load(config_file)
+    for setting, (option_list, position, data_type) in SETTINGS.items():
+        value = getattr(arguments, setting)
+        if value is None and setting in config:
+            value = data_type(config[setting])
+        if value is not None:
+            options[option_list][position] = value
+
+    grid = dict(config.get("grid", {}))
+    unknown = [setting for setting in grid if setting not in SETTINGS]
+    if unknown:
+        raise ValueError(
+            f"Unknown grid settings {', '.join(unknown)} in {arguments.config}, "
+            f"choose from {', '.join(SETTINGS)}"
+        )
+    for setting, values in arguments.grid:
+        grid[setting] = values
+    return options, grid
+
+
+def write_counts(model, output_dir):
+    conditions, statuses = count_vectors(
+        model.condition_count_per_iteration,
+        model.financial_impact_count_per_iteration,
+    )
+    DataFrame(conditions, columns=CONDITIONS).to_csv(f"{output_dir}/condition_counts.csv")
+    DataFrame(statuses, columns=FINANCIAL_STATUSES).to_csv(
+        f"{output_dir}/financial_status_counts.csv"
+    )
+    model.metrics.frame().to_csv(f"{output_dir}/metrics.csv", index=False)
+
+
+def main(argv=None):
+    arguments = parse_arguments(argv)
+    options, grid = compose_options(arguments)
+    output_dir = f"{arguments.output_dir}/{time.strftime('%d.%m.%y/%H:%M:%S')}"
+    start_time = time.time()
+
+    if arguments.command == "run":
+        settings = {
+            "options": options,
+            "engine": arguments.engine,
+            "rng": arguments.rng or "legacy",
+            "render": arguments.render,
+            "renderer": arguments.renderer,
+            "stats_formats": ("csv", "store")
+            if arguments.stats_format == "both"
+            else (arguments.stats_format,),
+            "graph_format": arguments.graph_format,
+            "animation_formats": ("gif", "apng") if arguments.apng else ("gif",),
+        }
+        if arguments.resume:
+            # Results of a resumed run depend on the settings it was started with
+            output_dir = arguments.resume
+            settings = Checkpoint(checkpoint_path(output_dir)).metadata()["settings"]
+        model = Model(
+            output_dir=output_dir,
+            options=settings["options"],
+            engine=settings["engine"],
+            rng=settings["rng"],
+            render=settings["render"],
+            renderer=settings["renderer"],
+            layout_cache_dir=arguments.layout_cache or f"{arguments.output_dir}/layouts",
+            animation_formats=tuple(settings["animation_formats"]),
+            grid_pixel_budget=arguments.grid_budget,
+            grid_pages=arguments.grid_pages,
+            stats_formats=tuple(settings["stats_formats"]),
+            graph_format=settings["graph_format"],
+            checkpoint_every=arguments.checkpoint_every,
+            resume=bool(arguments.resume),
+        )
+        model.auto_run()
+        write_counts(model, output_dir)
+    elif arguments.command == "ensemble":
+        Ensemble(
+            options,
+            replicates=arguments.replicates,
+            output_dir=output_dir,
+            engine=arguments.engine,
+            rng=arguments.rng or "philox",
+            workers=arguments.workers,
+            representative=arguments.representative,
+            renderer=arguments.renderer,
+        ).run()
+    else:
+        option_sets = expand_grid(options, grid)
+        rng = arguments.rng or "legacy"
+        # Named after the sweep rather than the time, so the same command resumes it
+        output_dir = arguments.summary or default_summary_path(
+            arguments.output_dir, option_sets, arguments.engine, rng
+        )
+        sweep = Sweep(
+            option_sets,
+            summary_path=output_dir,
+            engine=arguments.engine,
+            rng=rng,
+            workers=arguments.workers,
+        )
+        sweep.run()
+        for settings, error in sweep.failures:
+            print(f"Run failed, {type(error).__name__}: {error}\n  {settings}")
+
+    print(f"MODEL DURATION: {round((time.time() - start_time), 2)}")
+    print(f"Outputs written to {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
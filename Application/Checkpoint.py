@@ -0,0 +1,112 @@
+import json
+import os
+import numpy as np
+
+# AgentState arrays, which hold every agent attribute the array engines step
+STATE_ARRAYS = (
+    "condition",
+    "time_exposed",
+    "able_to_recover",
+    "initial_asset_value",
+    "current_asset_value",
+    "financial_impact",
+)
+
+
+def checkpoint_path(output_dir: str):
+    # Where a run in output_dir keeps its latest checkpoint
+    return f"{output_dir}/checkpoint/checkpoint.npz"
+
+
+class Checkpoint:
+    """
+    Snapshot of a run at a cycle boundary, from which it can be resumed.
+
+    A checkpoint is a single uncompressed .npz of arrays (agent state,
+    each graph's edge list and node/edge attribute columns, layout
+    positions) plus a JSON document of everything else (settings, counts,
+    metrics, exported frames), stored in the archive alongside them. It
+    replaces the previous checkpoint atomically, so a run that dies while
+    saving still leaves the last complete one.
+
+    Attributes
+    ----------
+    path : str
+        .npz file path
+
+    Methods
+    -------
+    exists():
+        Whether a checkpoint has been saved.
+
+    save(metadata, arrays):
+        Replaces the checkpoint.
+
+    load():
+        Reads the checkpoint.
+
+    metadata():
+        Reads only the JSON document of the checkpoint.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str):
+                .npz file path
+        """
+        self.path = path
+
+    def exists(self):
+        """
+        Whether a checkpoint has been saved.
+
+        Returns:
+            exists (bool):
+                True when the file is present
+        """
+        return os.path.exists(self.path)
+
+    def save(self, metadata, arrays):
+        """
+        Replaces the checkpoint.
+
+        Args:
+            metadata (dict):
+                JSON-serialisable values
+            arrays (dict):
+                arrays keyed by name
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as checkpoint_file:
+            np.savez(checkpoint_file, metadata=np.array(json.dumps(metadata)), **arrays)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temporary_path, self.path)
+
+    def load(self):
+        """
+        Reads the checkpoint.
+
+        Returns:
+            metadata (dict):
+                values passed to save
+            arrays (dict):
+                arrays passed to save
+        """
+        with np.load(self.path) as checkpoint:
+            metadata = json.loads(str(checkpoint["metadata"]))
+            arrays = {name: checkpoint[name] for name in checkpoint.files if name != "metadata"}
+        return metadata, arrays
+
+    def metadata(self):
+        """
+        Reads only the JSON document of the checkpoint.
+
+        Returns:
+            metadata (dict):
+                values passed to save
+        """
+        with np.load(self.path) as checkpoint:
+            return json.loads(str(checkpoint["metadata"]))
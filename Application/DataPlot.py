@@ -1,13 +1,20 @@
 import os
-import pandas
-import glob
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from Snapshots import SnapshotView
+
+
+def mean_asset_value(agents):
+    return agents['current_asset_value'].mean()
 
 
 class DataPlot:
-    def __init__(self, path_to_data, export_path):
+    def __init__(self, path_to_data=None, export_path=None, metrics=None):
         self.width, self.height = 800, 500
-        self.dataframes = self.read_data_from_dir(path_to_data)
+        # Charts are drawn from the run's RunMetrics when given,
+        # otherwise from the node attribute CSVs in path_to_data
+        self.metrics = metrics
+        self.dataframes = self.read_data_from_dir(path_to_data) if metrics is None else None
         self.export_path = export_path
         self.init_plot_output_dir()
 
@@ -16,19 +23,27 @@ class DataPlot:
         dirs, file = os.path.split(self.export_path)
         os.makedirs(dirs, exist_ok=True)
         
-    def read_data_from_dir(self, dir_path):
-        dataframes = []
-        for csv in sorted(glob.glob(f"{dir_path}/*.csv")):
-            dataframes.append(pandas.read_csv(csv, index_col=0))
-        return dataframes
+    def read_data_from_dir(self, dir_path, columns=("current_asset_value",)):
+        # Lazy view of the CSVs, read in parallel and pruned to the columns charts use
+        return SnapshotView(dir_path, columns=columns)
 
     def mean_fin_impact(self):
-        x = range(0, len(self.dataframes))
-        y = [df['current_asset_value'].mean() for df in self.dataframes]
-        plt.plot(x, y, label = 'Mean Asset Value')
-        plt.xlabel('Time')
-        plt.ylabel('Financial Impact')
-        plt.legend()
-        plt.title('Decrease of Mean Asset Value over Time')
-        plt.gcf().autofmt_xdate()
-        plt.savefig(f"{self.export_path}/mean_fin_impact.png")
+        if self.metrics is not None:
+            y = self.metrics.series(
+                "current_asset_value", "mean", phases=("initial", "financial")
+            )
+        else:
+            y = self.dataframes.map(mean_asset_value)
+        x = range(0, len(y))
+        # Drawn without pyplot, so charts can be made off the main thread (e.g. while
+        # the GUI runs the model) and never draw over those of earlier runs
+        figure = Figure()
+        FigureCanvasAgg(figure)
+        axes = figure.add_subplot()
+        axes.plot(x, y, label = 'Mean Asset Value')
+        axes.set_xlabel('Time')
+        axes.set_ylabel('Financial Impact')
+        axes.legend()
+        axes.set_title('Decrease of Mean Asset Value over Time')
+        figure.autofmt_xdate()
+        figure.savefig(f"{self.export_path}/mean_fin_impact.png")
@@ -0,0 +1,309 @@
+import math
+import random
+import numpy as np
+from AgentState import INFECTIOUS, REMOVED, SUSCEPTIBLE
+
+
+def save_attributes(state, names):
+    # Copies of the given agent attributes, which steps modify in place
+    return {name: getattr(state, name).copy() for name in names}
+
+
+def restore_attributes(state, saved):
+    # Puts agent attributes back to saved values, marking the agents that differ as modified
+    changed = np.zeros(len(state), dtype=bool)
+    for name, values in saved.items():
+        changed |= getattr(state, name) != values
+        setattr(state, name, values.copy())
+    state.mark_modified(np.flatnonzero(changed))
+
+
+class PandemicEngine:
+    """
+    Array-backed equivalent of Model.run_pandemic_model.
+
+    Adjacency is held as CSR index arrays and agent condition/time_exposed
+    in the shared AgentState, so a whole iteration is resolved with batched
+    array operations instead of per-edge networkx lookups. As with the
+    networkx implementation, which copies the financial graph's attributes
+    onto the pandemic graph before every iteration, each iteration of a
+    phase starts from the agents as they were at the start of the phase and
+    only edge colours carry over. Results (conditions, times exposed, edge
+    colours) are the same as the networkx implementation's.
+
+    Attributes
+    ----------
+    graph : Graph
+        pandemic model graph whose edge colours are kept in sync after each step
+    state : AgentState
+        agent state shared with the financial model
+    edge_colour : ndarray
+        colour of each edge, in graph.edges() order
+    phase_start : dict
+        agent attributes as they were at the start of the current phase
+    """
+
+    # Agent attributes modified by a step
+    phase_attributes = ("condition", "time_exposed", "able_to_recover")
+
+    def __init__(self, graph, state):
+        """
+        Constructs the CSR views of the graph.
+
+        Args:
+            graph (Graph):
+                pandemic model graph
+            state (AgentState):
+                agent state shared with the financial model
+        """
+        self.graph = graph
+        self.state = state
+        self.indptr, self.indices, self.edge_ids = graph.compressed_adjacency()
+        self.degrees = np.diff(self.indptr)
+        # Source node and position within the source's adjacency of each CSR entry
+        self.sources = np.repeat(np.arange(0, len(self.degrees)), self.degrees)
+        self.positions = np.arange(0, len(self.indices)) - self.indptr[self.sources]
+        forward = self.indices >= self.sources
+        self.edges = (self.sources[forward], self.indices[forward])
+        self.edge_colour = np.array(
+            [colour for _, _, colour in graph.graph.edges.data("edge_colour")],
+            dtype=object,
+        )
+        self.draws = np.empty(0)
+        self.phase_start = None
+        self.phase_steps = 0
+
+    def start_phase(self):
+        """
+        Remembers the agents as they are now, which every following step
+        starts from until the next phase.
+        """
+        self.phase_start = save_attributes(self.state, self.phase_attributes)
+        self.phase_steps = 0
+
+    def transmission_draws(self, cycle, nodes):
+        """
+        Chance of transmission for each node, identical to seeding the global
+        generator with (cycle + node) as Model.run_pandemic_model does.
+        Draws only depend on their key, so each is computed once and cached.
+
+        Args:
+            cycle (int):
+                current model cycle
+            nodes (ndarray):
+                target nodes to draw for
+
+        Returns:
+            draws (ndarray):
+                rounded uniform draw per node
+        """
+        keys = cycle + nodes
+        if len(keys) and keys.max() >= len(self.draws):
+            extended = np.full(keys.max() + 1, np.nan)
+            extended[: len(self.draws)] = self.draws
+            self.draws = extended
+        missing = np.unique(keys[np.isnan(self.draws[keys])])
+        for key in missing.tolist():
+            self.draws[key] = round(random.Random(key).random(), 2)
+        return self.draws[keys]
+
+    def step(self, cycle, transmission_rate, time_to_recover, draws=None):
+        """
+        Advances the pandemic by one iteration, from the agents as they were
+        at the start of the phase when one was started.
+
+        The networkx implementation visits sources in index order and each
+        source's edges in adjacency order; within that sweep a source removes
+        itself on its first edge once time_exposed > time_to_recover, transmits
+        while time_exposed > time_before_becoming_contagious, and bumps its own
+        time_exposed after its first edge. Only agents infectious before the
+        sweep can transmit, so every edge's outcome follows from the starting
+        state and the edge's position within its source's adjacency.
+
+        Args:
+            cycle (int):
+                current model cycle, used to key transmission draws
+            transmission_rate (float):
+                ease of transmission between neighbouring agents
+            time_to_recover (int):
+                iterations an agent stays infectious before being removed
+            draws (ndarray):
+                chance of transmission of each node, e.g. from RandomStreams;
+                the (cycle + node) seeded draws are used when None
+
+        Returns:
+            changed_nodes (ndarray):
+                nodes whose attributes were modified
+        """
+        if self.phase_steps:
+            restore_attributes(self.state, self.phase_start)
+        self.phase_steps += 1
+        time_before_becoming_contagious = math.ceil(time_to_recover / 5)
+        condition, time_exposed = self.state.condition, self.state.time_exposed
+        sources, targets, positions = self.sources, self.indices, self.positions
+
+        has_edges = self.degrees > 0
+        overdue = (time_exposed > time_to_recover) & has_edges
+        active = (condition == INFECTIOUS) & ~overdue & has_edges
+        # time_exposed seen by a source's later edges, after its own increment
+        bumped = time_exposed + 1
+        removed_mid_sweep = active & (self.degrees > 1) & (bumped > time_to_recover)
+
+        source_exposure = time_exposed[sources]
+        contagious = active[sources] & np.where(
+            positions == 0,
+            source_exposure > time_before_becoming_contagious,
+            (source_exposure + 1 > time_before_becoming_contagious)
+            & (source_exposure + 1 <= time_to_recover),
+        )
+        candidates = np.flatnonzero(contagious & (condition[targets] == SUSCEPTIBLE))
+        if draws is None:
+            chance_of_transmission = self.transmission_draws(cycle, targets[candidates])
+        else:
+            chance_of_transmission = draws[targets[candidates]]
+        candidates = candidates[transmission_rate - chance_of_transmission >= 0.00]
+        # The first transmitting edge of the sweep infects the target
+        infected, first = np.unique(targets[candidates], return_index=True)
+        infecting_edges = self.edge_ids[candidates[first]]
+        cleared_edges = self.edge_ids[
+            overdue[sources] | (removed_mid_sweep[sources] & (positions > 0))
+        ]
+
+        removed = overdue | removed_mid_sweep
+        able_to_recover = ~(removed | active)
+        able_to_recover[infected] = False
+        changed = removed & (condition != REMOVED)
+        changed |= active
+        changed |= able_to_recover != self.state.able_to_recover
+        changed[infected] = True
+
+        condition[removed] = REMOVED
+        condition[infected] = INFECTIOUS
+        time_exposed[active] += 1
+        self.state.able_to_recover = able_to_recover
+
+        changed_nodes = np.flatnonzero(changed)
+        self.state.mark_modified(changed_nodes)
+        self.write_edge_colours(cleared_edges, self.graph.default_colour)
+        self.write_edge_colours(infecting_edges, "#FF0000")
+        return changed_nodes
+
+    def write_edge_colours(self, edges, colour):
+        edges = edges[self.edge_colour[edges] != colour]
+        self.edge_colour[edges] = colour
+        sources, targets = self.edges
+        self.graph.set_edge_colours(zip(sources[edges].tolist(), targets[edges].tolist()), colour)
+
+
+class FinancialEngine:
+    """
+    Array-backed equivalent of Model.run_financial_model.
+
+    Lockdown reductions, neighbour loan eligibility and bail-outs are
+    computed for the whole population as vector operations over the
+    financial graph's CSR adjacency, reading and writing the shared
+    AgentState. Each iteration of a phase starts from the agents as they
+    were at the start of the phase, as with PandemicEngine, so results are
+    the same as the networkx implementation's.
+
+    Attributes
+    ----------
+    graph : Graph
+        financial model graph
+    state : AgentState
+        agent state shared with the pandemic model
+    phase_start : dict
+        agent attributes as they were at the start of the current phase
+    """
+
+    # Agent attributes modified by a step
+    phase_attributes = ("current_asset_value", "financial_impact")
+
+    def __init__(self, graph, state):
+        """
+        Constructs the CSR views of the graph.
+
+        Args:
+            graph (Graph):
+                financial model graph
+            state (AgentState):
+                agent state shared with the pandemic model
+        """
+        self.graph = graph
+        self.state = state
+        self.indptr, self.indices, _ = graph.compressed_adjacency()
+        self.degrees = np.diff(self.indptr)
+        self.sources = np.repeat(np.arange(0, len(self.degrees)), self.degrees)
+        self.phase_start = None
+        self.phase_steps = 0
+
+    def start_phase(self):
+        """
+        Remembers the agents as they are now, which every following step
+        starts from until the next phase.
+        """
+        self.phase_start = save_attributes(self.state, self.phase_attributes)
+        self.phase_steps = 0
+
+    def step(self, lockdown_severity, loan_threshold):
+        """
+        Advances the financial model by one iteration, from the agents as they
+        were at the start of the phase when one was started.
+
+        The networkx implementation visits agents in index order, so a
+        neighbour's asset value is read after its own update when it has a
+        lower index and before it otherwise. An agent's value only changes
+        during its own visit, which lets each neighbour's loan eligibility be
+        read from either the starting or the reduced asset values. Bail-outs
+        add an agent's (negative) asset value to itself once per eligible
+        neighbour, i.e. double it.
+
+        Args:
+            lockdown_severity (float):
+                fraction of initial asset value lost per iteration by locked-down agents
+            loan_threshold (float):
+                divisor of a neighbour's initial asset value below which it cannot lend
+
+        Returns:
+            changed_nodes (ndarray):
+                nodes whose attributes were modified
+        """
+        if loan_threshold <= 0:
+            raise ValueError("loan_threshold must be positive")
+        if self.phase_steps:
+            restore_attributes(self.state, self.phase_start)
+        self.phase_steps += 1
+
+        state = self.state
+        initial, current = state.initial_asset_value, state.current_asset_value
+        sources, targets = self.sources, self.indices
+
+        locked_down = (state.condition == INFECTIOUS) & (state.time_exposed > 1)
+        reduced = np.where(
+            locked_down, current - (initial * lockdown_severity), current
+        )
+        neighbour_loan_threshold = initial / loan_threshold
+        able_to_lend = np.where(
+            targets < sources,
+            reduced[targets] >= neighbour_loan_threshold[targets],
+            current[targets] >= neighbour_loan_threshold[targets],
+        )
+        bailed_out = (
+            able_to_lend
+            & (reduced[sources] < 0)
+            & (reduced[sources] <= neighbour_loan_threshold[targets])
+        )
+        # Sparse matrix-vector product: eligible lenders per agent
+        bail_outs = np.bincount(
+            sources, weights=bailed_out, minlength=len(self.degrees)
+        ).astype(np.int64)
+        updated = np.where(reduced < 0, np.ldexp(reduced, bail_outs), reduced)
+        impact = np.where(self.degrees > 0, updated / initial, state.financial_impact)
+
+        changed = locked_down | (bail_outs > 0) | (impact != state.financial_impact)
+        state.current_asset_value = updated
+        state.financial_impact = impact
+
+        changed_nodes = np.flatnonzero(changed)
+        state.mark_modified(changed_nodes)
+        return changed_nodes
@@ -0,0 +1,226 @@
+import concurrent.futures
+import os
+import numpy as np
+from pandas import DataFrame
+from AgentState import CONDITIONS, FINANCIAL_STATUSES, classify_financial_impact
+from Model import Model
+
+
+def count_vectors(condition_counts, financial_impact_counts):
+    """
+    Converts a model's per-iteration (value, count) pairs into fixed-width
+    count arrays, with financial impacts grouped by financial status.
+
+    Args:
+        condition_counts (list):
+            Model.condition_count_per_iteration
+        financial_impact_counts (list):
+            Model.financial_impact_count_per_iteration
+
+    Returns:
+        conditions (ndarray):
+            [iteration x condition] agent counts
+        statuses (ndarray):
+            [iteration x financial status] agent counts
+    """
+    conditions = np.zeros((len(condition_counts), len(CONDITIONS)), dtype=np.int64)
+    for iteration, counts in enumerate(condition_counts):
+        for condition, count in counts:
+            conditions[iteration, CONDITIONS.index(condition)] = count
+
+    statuses = np.zeros(
+        (len(financial_impact_counts), len(FINANCIAL_STATUSES)), dtype=np.int64
+    )
+    for iteration, counts in enumerate(financial_impact_counts):
+        if counts:
+            impacts, impact_counts = zip(*counts)
+            status_codes = [
+                FINANCIAL_STATUSES.index(status)
+                for status in classify_financial_impact(impacts).tolist()
+            ]
+            np.add.at(statuses[iteration], status_codes, impact_counts)
+    return conditions, statuses
+
+
+def run_replicate(
+    options, seed, engine="vectorized", rng="philox", output_dir=None, renderer="bokeh"
+):
+    """
+    Runs a single replicate of the compound model with the given seed.
+
+    Args:
+        options (list):
+            model options, in the shape Model.enforce_input_value_data_types expects
+        seed (int):
+            random seed replacing the one in options
+        engine (str):
+            model step engine, see Model
+        rng (str):
+            transmission draw generator, see Model
+        output_dir (str):
+            directory for a fully rendered run, or None for counts only
+        renderer (str):
+            network plot backend of a rendered run, see Model
+
+    Returns:
+        conditions (ndarray):
+            [iteration x condition] agent counts
+        statuses (ndarray):
+            [iteration x financial status] agent counts
+    """
+    replicate_options = [list(option_list) for option_list in options]
+    replicate_options[0][3] = seed
+    model = Model(
+        output_dir=output_dir,
+        options=replicate_options,
+        engine=engine,
+        rng=rng,
+        render=output_dir is not None,
+        # Replicates already run in parallel, so frames are exported inline
+        render_workers=0,
+        renderer=renderer,
+    )
+    model.auto_run()
+    return count_vectors(
+        model.condition_count_per_iteration,
+        model.financial_impact_count_per_iteration,
+    )
+
+
+class Ensemble:
+    """
+    Monte Carlo ensemble of compound model replicates run across a process pool.
+
+    Attributes
+    ----------
+    seeds : list
+        seed of each replicate, derived from the seed in options
+    conditions : ndarray
+        [replicate x iteration x condition] agent counts
+    statuses : ndarray
+        [replicate x iteration x financial status] agent counts
+    summary : DataFrame
+        mean and percentile bands of every count per iteration
+
+    Methods
+    -------
+    run():
+        Runs all replicates and aggregates their counts.
+
+    aggregate():
+        Mean and percentile bands of the replicates' counts.
+    """
+
+    def __init__(
+        self,
+        options,
+        replicates: int,
+        output_dir: str,
+        engine: str = "vectorized",
+        rng: str = "philox",
+        workers: int = None,
+        representative: bool = False,
+        percentiles=(5, 50, 95),
+        renderer: str = "bokeh",
+    ):
+        """
+        Constructs essential attributes for the Ensemble object.
+
+        Args:
+            options (list):
+                model options, in the shape Model.enforce_input_value_data_types expects
+            replicates (int):
+                number of replicates to run, at least 1
+            output_dir (str):
+                directory the summary (and representative run) is written to
+            engine (str):
+                model step engine, see Model
+            rng (str):
+                transmission draw generator, see Model; "philox" makes
+                draws depend on each replicate's seed
+            workers (int):
+                number of worker processes, defaults to the number of CPUs
+            representative (bool):
+                whether the first replicate renders plots, GraphML and GIFs
+            percentiles (tuple):
+                percentiles reported alongside the mean
+            renderer (str):
+                network plot backend of the representative run, see Model
+        """
+        if replicates < 1:
+            raise ValueError(f"replicates must be at least 1, got {replicates}")
+        self.options = options
+        self.output_dir = output_dir
+        self.engine = engine
+        self.rng = rng
+        self.workers = workers
+        self.representative = representative
+        self.percentiles = percentiles
+        self.renderer = renderer
+        seed_sequence = np.random.SeedSequence(int(options[0][3]))
+        self.seeds = [
+            int(child.generate_state(1)[0] >> 1)
+            for child in seed_sequence.spawn(replicates)
+        ]
+
+    def run(self):
+        """
+        Runs all replicates and aggregates their counts.
+
+        Returns:
+            summary (DataFrame):
+                mean and percentile bands of every count per iteration
+        """
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = []
+            for replicate, seed in enumerate(self.seeds):
+                output_dir = None
+                if self.representative and replicate == 0:
+                    output_dir = f"{self.output_dir}/representative"
+                futures.append(
+                    executor.submit(
+                        run_replicate,
+                        self.options,
+                        seed,
+                        self.engine,
+                        self.rng,
+                        output_dir,
+                        self.renderer,
+                    )
+                )
+            results = [future.result() for future in futures]
+
+        self.conditions = np.stack([conditions for conditions, _ in results])
+        self.statuses = np.stack([statuses for _, statuses in results])
+        self.summary = self.aggregate()
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.summary.to_csv(f"{self.output_dir}/ensemble.csv", index=False)
+        return self.summary
+
+    def aggregate(self):
+        """
+        Mean and percentile bands of the replicates' counts.
+
+        Returns:
+            summary (DataFrame):
+                one row per (measure, iteration, category)
+        """
+        rows = []
+        for measure, categories, counts in [
+            ("condition", CONDITIONS, self.conditions),
+            ("financial_status", FINANCIAL_STATUSES, self.statuses),
+        ]:
+            mean = counts.mean(axis=0)
+            bands = np.percentile(counts, self.percentiles, axis=0)
+            for iteration in range(0, counts.shape[1]):
+                for category_index, category in enumerate(categories):
+                    row = {
+                        "measure": measure,
+                        "iteration": iteration,
+                        "category": category,
+                        "mean": mean[iteration, category_index],
+                    }
+                    for percentile, band in zip(self.percentiles, bands):
+                        row[f"p{percentile}"] = band[iteration, category_index]
+                    rows.append(row)
+        return DataFrame(rows)
@@ -1,15 +1,19 @@
+import collections
 import functools
-import itertools
+import multiprocessing
 import glob
 import pathlib
+import queue
 import tkinter.ttk
 import threading
 import time
 import tkinter
 import tkinter.filedialog
+import numpy as np
 import PIL.Image
 import PIL.ImageTk
-from Model import Model
+from LogSink import LogSink
+from Model import Model, RunCancelled
 
 
 class GUI(tkinter.Tk):
@@ -22,9 +26,24 @@ class GUI(tkinter.Tk):
         self.output_dir = "output"
         # self.log actually created later on
         self.log_level = 'FULL'
+        # EXPORT renders frames and GIFs and shows them after the run, LIVE only draws
+        # the network live, from the simulation state, while the model runs
+        self.frame_mode = 'EXPORT'
+        # Cycles between checkpoints of a run, 0 for none. A run cut short
+        # can be continued with CLI.py run --resume <run dir>
+        self.checkpoint_every = 0
         self.latest_datetime = time.strftime("%d.%m.%y/%H:%M:%S")
         self.latest_pandemic_model_gif = ""
         self.latest_financial_model_gif = ""
+        self.graph_image_label = None
+        # The model runs on a worker thread, which sends its progress and
+        # result back over a queue that the Tk main loop polls. Progress
+        # events are dropped while the queue is full, as later ones supersede
+        # them, and live frames are merged outside the queue until drawn
+        self.model_thread = None
+        self.model_events = queue.Queue(maxsize=100)
+        self.live_frames = LiveFrames()
+        self.cancel_event = threading.Event()
 
     def create_window(self):
         # GUI Window settings
@@ -137,8 +156,13 @@ class GUI(tkinter.Tk):
         self.log_level = log_level
         return log_level
 
+    def set_frame_mode(self, button):
+        self.frame_mode = 'LIVE' if self.frame_mode == 'EXPORT' else 'EXPORT'
+        button.configure(text=f"Frames: {self.frame_mode}")
+        return self.frame_mode
+
     def compose_output_commands_frame(self, frame):
-        frame.grid_rowconfigure(6, weight=1)
+        frame.grid_rowconfigure(7, weight=1)
         create_separator(
             frame=frame,
             orientation="vertical",
@@ -177,11 +201,14 @@ class GUI(tkinter.Tk):
             sticky="ew",
         )
 
-        output_button_text = ["Switch Shown Graph", "Set Output Location", f"Log Level: FULL"]
+        output_button_text = [
+            "Switch Shown Graph", "Set Output Location", f"Log Level: FULL", "Frames: EXPORT"
+        ]
         output_button_commands = [
             functools.partial(self.load_gif_to_gui, self.graph_frame),
             functools.partial(self.set_output_directory),
-            functools.partial(self.set_log_level)
+            functools.partial(self.set_log_level),
+            functools.partial(self.set_frame_mode),
         ]
         buttons = []
         for button in range(0, len(output_button_text)):
@@ -200,9 +227,10 @@ class GUI(tkinter.Tk):
                 pady=(4, 0),
             ))
         buttons[2].configure(command=functools.partial(self.set_log_level, button = buttons[2]))
+        buttons[3].configure(command=functools.partial(self.set_frame_mode, button = buttons[3]))
 
     def compose_model_commands_frame(self, frame):
-        frame.grid_rowconfigure(6, weight=1)
+        frame.grid_rowconfigure(8, weight=1)
         create_separator(
             frame=frame,
             orientation="vertical",
@@ -241,9 +269,9 @@ class GUI(tkinter.Tk):
             sticky="ew",
         )
 
-        label_text = ["Run Model:", "Empty Log:", "Reset Inputs:"]
-        button_text = ["Ctrl + ↩", "Ctrl + ⌫", "Ctrl + R"]
-        keybindings = ["<Control-Return>", "<Control-BackSpace>", "<Control-r>"]
+        label_text = ["Run Model:", "Empty Log:", "Reset Inputs:", "Cancel Run:"]
+        button_text = ["Ctrl + ↩", "Ctrl + ⌫", "Ctrl + R", "Esc"]
+        keybindings = ["<Control-Return>", "<Control-BackSpace>", "<Control-r>", "<Escape>"]
 
         model_commands = [
             functools.partial(
@@ -260,6 +288,7 @@ class GUI(tkinter.Tk):
                 self.field_entries,
                 self.field_defaults
             ),
+            functools.partial(self.cancel_run),
         ]
         for command in range(0, len(model_commands)):
             create_label(
@@ -288,6 +317,17 @@ class GUI(tkinter.Tk):
                 pady=(0, 0),
             )
             self.bind(keybindings[command], model_commands[command])
+        self.progress_label = create_label(
+            frame=frame,
+            width=29,
+            text="",
+            anchor="center",
+            font=("TkDefaultFont", 11),
+            row=len(model_commands) + 3,
+            rowspan=1,
+            column=1,
+            columnspan=3,
+        )
 
     def compose_log_frame(self, frame):
         frame.update()
@@ -329,6 +369,9 @@ class GUI(tkinter.Tk):
             column=0,
             sticky="nesw",
         )
+        # Messages reach the listbox through the sink, in batches, from any thread
+        self.log_sink = LogSink()
+        self.log_sink.attach(self.log)
         create_separator(
             frame=frame,
             orientation="vertical",
@@ -584,17 +627,107 @@ class GUI(tkinter.Tk):
         else:
             log = None
 
-        start_time = time.time()
+        if self.model_thread is not None and self.model_thread.is_alive():
+            self.log_sink.insert("end", "A model is already running, press Esc to cancel it\n")
+            return
+
+        if log is not None:
+            # Tk widgets may only be used from the main thread
+            log = self.log_sink
+        self.cancel_event.clear()
         compound_model = Model(
             output_dir=output_dir, options=model_inputs, log=log,
+            layout_cache_dir=f"{self.output_dir}/layouts",
+            checkpoint_every=self.checkpoint_every,
+            progress=self.send_progress_event,
+            cancel=self.cancel_event,
+            render=self.frame_mode == 'EXPORT',
+            # Live frames are only sent while the live view is shown
+            live=self.live_frames.put if self.frame_mode == 'LIVE' else None,
+        )
+        if log is not None:
+            self.log_sink.open_file(f"{output_dir}/log.jsonl")
+        self.model_thread = threading.Thread(
+            target=self.run_model_in_background, args=(compound_model,), daemon=True
         )
-        compound_model.auto_run()
+        self.model_thread.start()
+        self.after(100, self.poll_model_events)
+
+    def send_progress_event(self, event):
+        # Runs on the worker thread, which never waits on the GUI for progress
+        try:
+            self.model_events.put_nowait(("progress", event))
+        except queue.Full:
+            pass
 
-        self.log.insert("end", f"MODEL DURATION: {round((time.time() - start_time), 2)}\n")
-        self.latest_pandemic_model_gif = compound_model.latest_pandemic_gif
-        self.latest_financial_model_gif = compound_model.latest_financial_gif
-        self.gif_to_load = ''
-        self.load_gif_to_gui(gui_frame=self.graph_frame)
+    def run_model_in_background(self, compound_model):
+        # Runs on the worker thread; results and errors go back over the queue
+        start_time = time.time()
+        try:
+            compound_model.auto_run()
+        except RunCancelled as cancelled:
+            self.model_events.put(("cancelled", str(cancelled)))
+        except Exception as error:
+            self.model_events.put(("error", f"{type(error).__name__}: {error}"))
+        else:
+            self.model_events.put(("done", (compound_model, time.time() - start_time)))
+
+    def poll_model_events(self, max_events=500):
+        # Handles the worker's events on the main thread, a bounded number per poll
+        # so the window stays responsive however fast the model logs
+        self.show_live_frames()
+        for _ in range(0, max_events):
+            try:
+                event, value = self.model_events.get_nowait()
+            except queue.Empty:
+                break
+            if event == "progress":
+                self.progress_label.configure(
+                    text=f"Cycle {value['cycle']}/{value['cycles']} ({value['phase']} "
+                    f"{value['iteration']}), {format_duration(value['elapsed'])} elapsed, "
+                    f"ETA {format_duration(value['eta'])}"
+                )
+            elif event == "done":
+                compound_model, duration = value
+                self.log_sink.insert("end", f"MODEL DURATION: {round(duration, 2)}\n")
+                self.progress_label.configure(text=f"Finished in {format_duration(duration)}")
+                self.latest_pandemic_model_gif = compound_model.latest_pandemic_gif
+                self.latest_financial_model_gif = compound_model.latest_financial_gif
+                if compound_model.render:
+                    self.gif_to_load = ''
+                    self.load_gif_to_gui(gui_frame=self.graph_frame)
+            else:
+                self.log_sink.insert("end", f"MODEL {event.upper()}: {value}\n")
+                self.progress_label.configure(text=f"Run {event}")
+            if event != "progress":
+                self.log_sink.close_file()
+        if self.model_thread.is_alive() or not self.model_events.empty():
+            self.after(100, self.poll_model_events)
+
+    def show_live_frames(self):
+        # Draws every live frame merged since the last poll; a new layout means a
+        # new run, whose live view replaces the shown animation
+        layout, colours, title = self.live_frames.take()
+        if layout is not None:
+            self.replace_graph_view(LiveView(self.graph_frame, width=self.width, height=500))
+            self.graph_image_label.set_layout(layout["positions"], layout["edges"])
+        if isinstance(self.graph_image_label, LiveView):
+            self.graph_image_label.update_nodes(colours)
+            if title is not None:
+                self.graph_image_label.set_title(title)
+
+    def replace_graph_view(self, graph_view):
+        # The previous view stops playing and releases its frames
+        if self.graph_image_label is not None:
+            self.graph_image_label.unload()
+            self.graph_image_label.destroy()
+        graph_view.grid(row=0, column=0, sticky="nesw")
+        self.graph_image_label = graph_view
+
+    def cancel_run(self, *args):
+        if self.model_thread is not None and self.model_thread.is_alive():
+            self.cancel_event.set()
+            self.progress_label.configure(text="Cancelling after this iteration...")
 
 
     def load_gif_to_gui(self, gui_frame):
@@ -608,7 +741,7 @@ class GUI(tkinter.Tk):
         if gif_path:
             graph_image_label = GIF(gui_frame)
             graph_image_label.load(gif_path)
-            graph_image_label.grid(row=0, column=0, sticky="nesw")
+            self.replace_graph_view(graph_image_label)
             return graph_image_label
         else:
             print('No .gif available to load.')
@@ -644,6 +777,7 @@ def create_label(
         frame, width=width, text=text, anchor=anchor, background="#F0F0F0", font=font
     )
     label.grid(row=row, column=column, rowspan=rowspan, columnspan=columnspan)
+    return label
 
 
 def create_entry(frame, width, state, default, row, column, font=("TkDefaultFont", 12)):
@@ -715,44 +849,206 @@ def create_separator(frame, orientation, row, rowspan, column, columnspan, stick
     )
 
 
+def format_duration(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes}:{seconds:02}"
+
+
+class LiveFrames:
+    """
+    Live frames sent by a model on its worker thread, merged until the Tk
+    main loop draws them.
+
+    Frames only hold the nodes whose colour changed, so none can be
+    dropped; instead each one is merged into a single pending update of
+    every node changed since the last draw, keeping the latest colour.
+    However far the GUI falls behind, the pending update holds at most
+    one colour per node.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.layout = None
+        self.colours = {}
+        self.title = None
+
+    def put(self, event):
+        # Model's live callback, runs on the worker thread
+        with self.lock:
+            if event["event"] == "layout":
+                self.layout, self.colours, self.title = event, {}, None
+            else:
+                self.colours.update(zip(event["nodes"].tolist(), event["colours"].tolist()))
+                self.title = f"{event['model'].upper()} MODEL: Cycle {event['cycle']}.{event['iteration']}"
+
+    def take(self):
+        # The layout (when new), colours and title pending since the last call
+        with self.lock:
+            pending = self.layout, self.colours, self.title
+            self.layout, self.colours, self.title = None, {}, None
+        return pending
+
+
+class LiveView(tkinter.Canvas):
+    """
+    Network drawn from a running model's live frames, without exporting any.
+
+    Edges and nodes are created once, at the model's layout; each frame then
+    only recolours the nodes whose colour changed. Edges are left out of
+    graphs with more than max_edges of them, as they would take longer to
+    draw than the model takes to run.
+    """
+
+    def __init__(self, master, width, height, max_edges: int = 20000):
+        super().__init__(master, width=width, height=height, background="#FFFFFF", highlightthickness=0)
+        self.width, self.height = width, height
+        self.max_edges = max_edges
+        self.node_items = []
+        self.title_item = None
+
+    def set_layout(self, positions, edges, margin: int = 20):
+        self.delete("all")
+        low, high = positions.min(axis=0), positions.max(axis=0)
+        scale = np.array([self.width - 2 * margin, self.height - 2 * margin]) / np.maximum(high - low, 1e-9)
+        points = margin + (positions - low) * scale
+        # Canvas y grows downwards, plots' upwards
+        points[:, 1] = self.height - points[:, 1]
+        if len(edges) <= self.max_edges:
+            for source, target in edges.tolist():
+                self.create_line(*points[source], *points[target], fill="#CCCCCC")
+        radius = 4 if len(points) <= 1000 else 2
+        outline = "#000000" if len(points) <= 1000 else ""
+        self.node_items = [
+            self.create_oval(x - radius, y - radius, x + radius, y + radius, fill="#CCCCCC", outline=outline)
+            for x, y in points.tolist()
+        ]
+        self.title_item = self.create_text(margin, margin // 2, anchor="nw", text="")
+
+    def set_title(self, text):
+        self.itemconfigure(self.title_item, text=text)
+
+    def update_nodes(self, colours):
+        # colours: New colour of each changed node, keyed by node
+        for node, colour in colours.items():
+            self.itemconfigure(self.node_items[node], fill=colour)
+
+    def unload(self):
+        self.delete("all")
+
+
+class FrameDecoder(threading.Thread):
+    """
+    Decodes the frames of an animation in the background, a few ahead of
+    the one being shown.
+
+    The decoder thread is the only user of the image after it starts, as
+    PIL images can't be read from several threads at once. Decoded frames
+    outside the window [wanted, wanted + prefetch] are dropped, so at most
+    prefetch + 1 are held.
+    """
+
+    def __init__(self, image, prefetch: int = 4):
+        super().__init__(daemon=True)
+        self.image = image
+        self.prefetch = prefetch
+        self.frame_count = getattr(image, "n_frames", 1)
+        self.frames = collections.OrderedDict()
+        self.wanted = 0
+        self.stopped = False
+        self.condition = threading.Condition()
+
+    def window(self):
+        return [(self.wanted + offset) % self.frame_count for offset in range(0, self.prefetch + 1)]
+
+    def request(self, index):
+        # Called from the Tk main thread with the frame it wants to show next
+        with self.condition:
+            self.wanted = index
+            self.condition.notify()
+            return self.frames.get(index)
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.stopped and all(index in self.frames for index in self.window()):
+                    self.condition.wait()
+                if self.stopped:
+                    self.image.close()
+                    return
+                window = self.window()
+                for index in list(self.frames):
+                    if index not in window:
+                        del self.frames[index]
+                index = next(index for index in window if index not in self.frames)
+            self.image.seek(index)
+            frame = (self.image.convert("RGB"), self.image.info.get("duration") or 600)
+            with self.condition:
+                self.frames[index] = frame
+
+
 # Adapted from: https://stackoverflow.com/questions/43770847/play-an-animated-gif-in-python-with-tkinter
 class GIF(tkinter.Label):
-    def load(self, image):
-        # image =
-        # print(image)
+    """
+    Animation player that decodes frames as playback reaches them, so it
+    starts at once and only holds a few frames, however long the run.
+    Decoded frames are prefetched by a FrameDecoder, and the PhotoImages
+    of the last few frames shown are kept in a small LRU cache.
+    """
+
+    def load(self, image, cache_size: int = 8, prefetch: int = 4):
         if isinstance(image, str):
             image = PIL.Image.open(image)
         self.loc = 0
-        self.frames = []
-
-        try:
-            for i in itertools.count(1):
-                self.frames.append(PIL.ImageTk.PhotoImage(image.copy()))
-                image.seek(i)
-        except EOFError:
-            pass
-
-        try:
-            self.delay = image.info["duration"]
-        except:
-            self.delay = 600
+        self.cache_size = cache_size
+        self.photo_images = collections.OrderedDict()
+        # Playback stops once unloaded
+        self.loaded = True
+        # The first frame is shown straight away, before the decoder takes the image over
+        self.show(0, PIL.ImageTk.PhotoImage(image.convert("RGB")), image.info.get("duration") or 600)
+        self.decoder = FrameDecoder(image, prefetch)
+        self.decoder.start()
+        if self.decoder.frame_count > 1:
+            self.after(self.delay, self.next_frame)
 
-        if len(self.frames) == 1:
-            self.config(image=self.frames[0])
-        else:
-            self.next_frame()
+    def show(self, index, photo_image, delay):
+        # Frames' own durations are used, as runs of identical frames are stored once
+        self.photo_images[index] = (photo_image, delay)
+        self.photo_images.move_to_end(index)
+        while len(self.photo_images) > self.cache_size:
+            self.photo_images.popitem(last=False)
+        self.config(image=photo_image)
+        self.delay = delay
 
     def unload(self):
         self.config(image="")
-        self.frames = None
+        self.loaded = False
+        self.photo_images = collections.OrderedDict()
+        self.decoder.stop()
 
     def next_frame(self):
-        if self.frames:
-            self.loc += 1
-            self.loc %= len(self.frames)
-            self.config(image=self.frames[self.loc])
-            self.after(self.delay, self.next_frame)
-
+        if not self.loaded:
+            return
+        index = (self.loc + 1) % self.decoder.frame_count
+        decoded = self.decoder.request(index)
+        if index in self.photo_images:
+            self.show(index, *self.photo_images[index])
+        elif decoded is not None:
+            frame, delay = decoded
+            self.show(index, PIL.ImageTk.PhotoImage(frame), delay)
+        else:
+            # Not decoded yet; the current frame stays up a little longer
+            self.after(10, self.next_frame)
+            return
+        self.loc = index
+        self.after(self.delay, self.next_frame)
 
 if __name__ == "__main__":
+    # Frame export workers are separate processes, also when frozen by PyInstaller
+    multiprocessing.freeze_support()
     GUI().mainloop()
\ No newline at end of file
@@ -1,17 +1,54 @@
+import copy
+import itertools
 import os
 import networkx as nx
+import numpy as np
 from pandas import DataFrame
 
 class Graph:
-    def __init__(self, agents, cohesion, graph_type, seed):
+    def __init__(self, agents, cohesion, graph_type, seed, state=None, edges=None):
         self.default_colour = "#CCCCCC"
-        self.generate_graph(agents, cohesion, graph_type, seed)
+        self.adjacency = None
+        # Optional AgentState shared with the other model's graph, in which case
+        # agent attributes are only copied onto nodes when they are rendered/exported
+        self.state = state
+        self.state_revision = -1
+        # Nodes modified by this model's step functions since the other graph last synced
+        self.changed_nodes = set()
+        # Nodes modified by this model's step functions since this graph last synced,
+        # which a sync puts back to the other graph's values
+        self.dirty_nodes = set()
+        # Colour of every edge not in the default colour, keyed by (lower, higher) node,
+        # so renderers can draw just these over a cached layer of default-coloured edges
+        self.coloured_edges = {}
+        self.generate_graph(agents, cohesion, graph_type, seed, edges)
 
-    def generate_graph(self, agents, cohesion, graph_type, seed):
+    def generate_graph(self, agents, cohesion, graph_type, seed, edges=None):
         num_of_nodes = len(agents.index)
-        dataframe_as_dict_of_dicts = agents.set_index(agents.index).to_dict('index')
-        self.graph = nx.erdos_renyi_graph(n=num_of_nodes, p=cohesion, seed=seed)
-        nx.set_node_attributes(self.graph, dataframe_as_dict_of_dicts)
+        # Generation is deterministic, so these identify the edge set
+        self.topology_key = (graph_type, num_of_nodes, cohesion, seed)
+        if edges is not None:
+            # Edge list of an earlier run (e.g. a checkpoint), in graph.edges() order. Both
+            # generators add edges in ascending (u, v) order, so adding them back in this
+            # order reproduces each node's adjacency order
+            self.graph = nx.Graph()
+            self.graph.add_nodes_from(range(0, num_of_nodes))
+            self.graph.add_edges_from(np.asarray(edges).tolist())
+        elif graph_type == "sparse_erdos_renyi":
+            # Same G(n, p) model, with its edges drawn in time proportional to the expected
+            # edge count. Only the draw is O(n + m) in NumPy: adding the edges and node/edge
+            # attributes to the networkx graph below is still done per item in Python, and
+            # dominates generate_graph on large populations
+            sources, targets = self.generate_sparse_random_edges(num_of_nodes, cohesion, seed)
+            self.graph = nx.Graph()
+            self.graph.add_nodes_from(range(0, num_of_nodes))
+            self.graph.add_edges_from(zip(sources.tolist(), targets.tolist()))
+            self.adjacency = self.compress_edges(num_of_nodes, sources, targets)
+        else:
+            self.graph = nx.erdos_renyi_graph(n=num_of_nodes, p=cohesion, seed=seed)
+        if self.state is None:
+            dataframe_as_dict_of_dicts = agents.set_index(agents.index).to_dict('index')
+            nx.set_node_attributes(self.graph, dataframe_as_dict_of_dicts)
 
         def add_extra_node_attributes(self):
             # Attribute that allows us to restrict incrementation
@@ -66,12 +103,147 @@ class Graph:
         )
         nx.set_node_attributes(self.graph, name="node_size", values=node_sizes)
 
-    def persist_attributes_between_graphs(self, from_graph):
-        updated_attributes = dict(from_graph.nodes(data=True))
-        nx.set_node_attributes(self.graph, updated_attributes)
-        self.scale_node_size_to_model()
+    def compressed_adjacency(self):
+        # CSR arrays of the graph's topology, built once as edges never change:
+        # neighbours of node i are indices[indptr[i]:indptr[i + 1]], kept in
+        # networkx adjacency order so array engines visit edges as graph.edges() does.
+        # edge_ids maps each entry to its edge's position in graph.edges()
+        if self.adjacency is None:
+            num_of_nodes = len(self.graph.nodes)
+            degrees = np.fromiter(
+                (len(self.graph.adj[node]) for node in range(0, num_of_nodes)),
+                dtype=np.int64,
+                count=num_of_nodes,
+            )
+            indptr = np.zeros(num_of_nodes + 1, dtype=np.int64)
+            np.cumsum(degrees, out=indptr[1:])
+            indices = np.fromiter(
+                itertools.chain.from_iterable(
+                    self.graph.adj[node] for node in range(0, num_of_nodes)
+                ),
+                dtype=np.int64,
+                count=indptr[-1],
+            )
+            self.adjacency = (indptr, indices, self.number_edges(indptr, indices))
+        return self.adjacency
+
+    @staticmethod
+    def generate_sparse_random_edges(num_of_nodes, cohesion, seed):
+        # Geometric edge skipping (as in nx.fast_gnp_random_graph): rather than
+        # testing all n(n-1)/2 node pairs, draw the gaps between successive
+        # selected pairs, where pair k enumerates (u, v), u < v, row by row
+        num_of_pairs = num_of_nodes * (num_of_nodes - 1) // 2
+        if cohesion <= 0 or num_of_pairs == 0:
+            pairs = np.empty(0, dtype=np.int64)
+        elif cohesion >= 1:
+            pairs = np.arange(0, num_of_pairs, dtype=np.int64)
+        else:
+            # As with the Philox streams, negative seeds are taken as their two's complement
+            rng = np.random.default_rng(seed % 2**64)
+            chunk_size = max(1024, int(num_of_pairs * cohesion * 1.1))
+            chunks, last_pair = [], -1
+            while last_pair < num_of_pairs:
+                pairs = last_pair + np.cumsum(rng.geometric(cohesion, size=chunk_size))
+                last_pair = pairs[-1]
+                chunks.append(pairs[pairs < num_of_pairs])
+            pairs = np.concatenate(chunks)
+
+        row_starts = np.arange(0, num_of_nodes, dtype=np.int64)
+        row_starts = row_starts * (2 * num_of_nodes - row_starts - 1) // 2
+        sources = np.searchsorted(row_starts, pairs, side="right") - 1
+        targets = pairs - row_starts[sources] + sources + 1
+        return sources, targets
+
+    @classmethod
+    def compress_edges(cls, num_of_nodes, sources, targets):
+        # CSR arrays in the adjacency order networkx gives edges added in this order
+        both_ends = np.stack([sources, targets], axis=1).ravel()
+        other_ends = np.stack([targets, sources], axis=1).ravel()
+        order = np.argsort(both_ends, kind="stable")
+        indptr = np.zeros(num_of_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(both_ends, minlength=num_of_nodes), out=indptr[1:])
+        indices = other_ends[order]
+        return (indptr, indices, cls.number_edges(indptr, indices))
+
+    @staticmethod
+    def number_edges(indptr, indices):
+        # graph.edges() yields each edge from its lower-indexed endpoint
+        sources = np.repeat(np.arange(0, len(indptr) - 1), np.diff(indptr))
+        keys = np.minimum(sources, indices) * (len(indptr) - 1) + np.maximum(sources, indices)
+        forward_keys = keys[indices >= sources]
+        order = np.argsort(forward_keys, kind="stable")
+        return order[np.searchsorted(forward_keys[order], keys)]
+
+    def persist_attributes_between_graphs(self, from_graph, nodes=None):
+        # Copies agent attributes of the given nodes (all when None) from the other graph.
+        # Degree and node size belong to each graph's own topology
+        local_attributes = ("degree", "node_size")
+        if nodes is None:
+            nodes = from_graph.nodes
+        for node in nodes:
+            attributes = self.graph.nodes[node]
+            for attribute, value in from_graph.nodes[node].items():
+                if attribute not in local_attributes:
+                    attributes[attribute] = value
+
+    def set_edge_colours(self, edges, colour):
+        # Colours the given (source, target) edges, keeping coloured_edges up to date
+        adjacency = self.graph.adj
+        for source, target in edges:
+            adjacency[source][target]["edge_colour"] = colour
+            key = (source, target) if source < target else (target, source)
+            if colour == self.default_colour:
+                self.coloured_edges.pop(key, None)
+            else:
+                self.coloured_edges[key] = colour
+
+    def find_coloured_edges(self):
+        # Rebuilds coloured_edges from the edge attributes, after they were set wholesale
+        self.coloured_edges = {
+            (source, target) if source < target else (target, source): colour
+            for source, target, colour in self.graph.edges.data("edge_colour")
+            if colour != self.default_colour
+        }
+
+    def take_changed_nodes(self):
+        changed_nodes, self.changed_nodes = self.changed_nodes, set()
+        return changed_nodes
+
+    def mark_changed_nodes(self, nodes):
+        self.changed_nodes.update(nodes)
+        self.dirty_nodes.update(nodes)
+
+    def sync_from(self, from_graph):
+        # Gives every node the other graph's attributes, as a full copy would: nodes
+        # either graph modified since they were last synced are the only ones that differ
+        nodes = from_graph.take_changed_nodes() | self.dirty_nodes
+        self.dirty_nodes = set()
+        self.persist_attributes_between_graphs(from_graph.graph, nodes=nodes)
+
+    def refresh_from_state(self):
+        # Copies agents modified since the last refresh from the shared state onto nodes
+        if self.state is None:
+            return
+        updated_nodes = self.state.modified_since(self.state_revision)
+        nx.set_node_attributes(self.graph, self.state.node_attributes(updated_nodes))
+        self.state_revision = self.state.revision
+
+    def snapshot(self):
+        # Detached copy with up-to-date visual attributes, which stays unchanged
+        # while this graph keeps stepping and can be sent to another process
+        self.update_visual_attributes()
+        snapshot = copy.copy(self)
+        snapshot.graph = self.graph.copy()
+        snapshot.state = None
+        snapshot.adjacency = None
+        snapshot.changed_nodes = set()
+        snapshot.dirty_nodes = set()
+        snapshot.coloured_edges = dict(self.coloured_edges)
+        return snapshot
 
     def update_visual_attributes(self):
+        self.refresh_from_state()
+
         def update_node_fill_colour(condition: str):
             return {
                 "susceptible": "#00FF00",
@@ -139,6 +311,23 @@ class Graph:
 
         assert len(self.graph.nodes) == len(alt_graph.nodes)
 
+        if self.state is not None:
+            graph_data = DataFrame(
+                {
+                    "geographic_degree": [degree for _, degree in self.graph.nodes.data("degree")],
+                    "financial_degree": [degree for _, degree in alt_graph.nodes.data("degree")],
+                    "condition": self.state.condition_names(),
+                    "time_exposed": self.state.time_exposed,
+                    "initial_asset_value": self.state.initial_asset_value,
+                    "current_asset_value": self.state.current_asset_value,
+                    "financial_impact": self.state.financial_impact,
+                }
+            )
+            self.write_csv(graph_data, output_path)
+            return
+
+        # Conditions are current on this (pandemic) graph and asset values on
+        # the financial one, as each is only synced before the other's step
         node_attributes = []
         for node in range(0, len(self.graph.nodes)):
             node_attributes.append(
@@ -147,9 +336,9 @@ class Graph:
                     alt_graph.nodes[node]["degree"],
                     self.graph.nodes[node]["condition"],
                     self.graph.nodes[node]["time_exposed"],
-                    self.graph.nodes[node]["initial_asset_value"],
-                    self.graph.nodes[node]["current_asset_value"],
-                    self.graph.nodes[node]["financial_impact"],
+                    alt_graph.nodes[node]["initial_asset_value"],
+                    alt_graph.nodes[node]["current_asset_value"],
+                    alt_graph.nodes[node]["financial_impact"],
                 ]
             )
         graph_data = DataFrame(
@@ -164,6 +353,9 @@ class Graph:
                 "financial_impact",
             ],
         )
+        self.write_csv(graph_data, output_path)
+
+    def write_csv(self, graph_data, output_path):
         dirs, _ = os.path.split(output_path)
         os.makedirs(dirs, exist_ok=True)
         graph_data.to_csv(output_path)
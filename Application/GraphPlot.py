@@ -1,11 +1,44 @@
 import os
 import bokeh.io
+import bokeh.io.webdriver
 import bokeh.models
 import bokeh.plotting
+import multiprocessing.util
 import platform
 import chromedriver_autoinstaller
 import geckodriver_autoinstaller
 
+
+class WebDriverPool:
+    # One headless browser per process, started on first export and reused
+    # by every later one; quit when the process (or render worker) exits
+    driver = None
+    drivers_installed = False
+    # Process the exit hook was registered in, so it is registered once per process
+    # however often the driver is re-created, and again in forked workers
+    finalizer_pid = None
+
+    @classmethod
+    def get(cls):
+        if cls.driver is None:
+            if not cls.drivers_installed:
+                chromedriver_autoinstaller.install(cwd=True)
+                geckodriver_autoinstaller.install(cwd=True)
+                cls.drivers_installed = True
+            # Tries a Chromium-based browser first, then Firefox
+            cls.driver = bokeh.io.webdriver.webdriver_control.create()
+            if cls.finalizer_pid != os.getpid():
+                multiprocessing.util.Finalize(cls, cls.close, exitpriority=10)
+                cls.finalizer_pid = os.getpid()
+        return cls.driver
+
+    @classmethod
+    def close(cls):
+        if cls.driver is not None:
+            bokeh.io.webdriver.webdriver_control.terminate(cls.driver)
+            cls.driver = None
+
+
 class GraphPlot:
     def __init__(self, title, graph, coords, export_path):
         self.title = title
@@ -14,8 +47,6 @@ class GraphPlot:
         self.coords = coords
         self.export_path = export_path
         self.plot = self.create_plot()
-        chromedriver_autoinstaller.install(cwd=True)
-        geckodriver_autoinstaller.install(cwd=True)
 
     def create_plot(self, interactive=False):
         base_plot = bokeh.models.Plot(
@@ -94,7 +125,9 @@ class GraphPlot:
         self.plot.renderers.append(graph_renderer)
         dirs, _ = os.path.split(self.export_path)
         os.makedirs(dirs, exist_ok=True)
-        bokeh.io.export_png(self.plot, filename=self.export_path)
+        bokeh.io.export_png(
+            self.plot, filename=self.export_path, webdriver=WebDriverPool.get()
+        )
 
 
     def render_and_export_graph(self):
@@ -0,0 +1,221 @@
+import json
+import os
+import networkx as nx
+import numpy as np
+
+
+def attribute_columns(items, names):
+    # One array per attribute, in the order of items (node or edge data views)
+    columns = {}
+    for name in names:
+        values = np.array([value for *_, value in items.data(name)])
+        if values.dtype.kind == "O":
+            raise ValueError(f"attribute {name} has no single type and cannot be stored")
+        columns[name] = values
+    return columns
+
+
+class GraphStore:
+    """
+    Record of a model graph over a run, storing the topology only once.
+
+    The edge list is written when the store is created, as a binary
+    [edge x 2] array in graph.edges() order. Each recorded iteration
+    then writes an .npz of just the node and edge attribute values that
+    changed since the previous record: for every such attribute, the
+    indices of the changed nodes (or edges) and their new values. The
+    first record holds every value. Any recorded iteration's full graph
+    is rebuilt by replaying the records up to it.
+
+    Attributes
+    ----------
+    path : str
+        directory of the store
+
+    Methods
+    -------
+    create(path, graph):
+        Creates an empty store of the graph's topology.
+
+    append(cycle, iteration, graph):
+        Records the attributes of the graph that changed since the last record.
+
+    records():
+        (cycle, iteration) of every recorded graph, in order.
+
+    graph(cycle, iteration):
+        The graph as it was at a recorded iteration.
+
+    graphs():
+        Every recorded graph, in order.
+    """
+
+    def __init__(self, path: str, append: bool = False):
+        """
+        Opens an existing store.
+
+        Args:
+            path (str):
+                directory of the store
+            append (bool):
+                whether more records will be appended, in which case the
+                attributes of the last record are replayed so the next one
+                is written as a delta of them
+        """
+        self.path = path
+        with open(f"{path}/metadata.json") as metadata_file:
+            self.metadata = json.load(metadata_file)
+        self.previous = None
+        if append:
+            for _, columns in self.replay():
+                self.previous = columns
+
+    @classmethod
+    def create(cls, path: str, graph):
+        """
+        Creates an empty store of the graph's topology.
+
+        Args:
+            path (str):
+                directory of the store, created if needed
+            graph (nx.Graph):
+                graph whose nodes are numbered 0 to n - 1
+
+        Returns:
+            store (GraphStore):
+                the new store
+        """
+        os.makedirs(f"{path}/deltas", exist_ok=True)
+        edges = np.array(list(graph.edges()), dtype=np.int32).reshape(-1, 2)
+        np.save(f"{path}/edges.npy", edges)
+        metadata = {
+            "version": 1,
+            "nodes": len(graph.nodes),
+            "edges": len(edges),
+            "graph_attributes": graph.graph,
+        }
+        with open(f"{path}/metadata.json", "w") as metadata_file:
+            json.dump(metadata, metadata_file, indent=2)
+        return cls(path)
+
+    def append(self, cycle: int, iteration: int, graph):
+        """
+        Records the attributes of the graph that changed since the last record.
+
+        Args:
+            cycle (int):
+                model cycle
+            iteration (int):
+                iteration within the cycle
+            graph (nx.Graph):
+                graph with the topology the store was created with
+        """
+        node_names = list(graph.nodes[0]) if len(graph.nodes) else []
+        edge_names = list(graph.edges[next(iter(graph.edges))]) if len(graph.edges) else []
+        current = {
+            "node": attribute_columns(graph.nodes, node_names),
+            "edge": attribute_columns(graph.edges, edge_names),
+        }
+
+        delta = {}
+        for kind, columns in current.items():
+            for name, values in columns.items():
+                previous = None if self.previous is None else self.previous[kind].get(name)
+                if previous is None or previous.dtype != values.dtype:
+                    changed = np.arange(0, len(values))
+                else:
+                    changed = np.flatnonzero(values != previous)
+                if len(changed):
+                    delta[f"{kind}/{name}/index"] = changed.astype(np.int32)
+                    delta[f"{kind}/{name}/values"] = values[changed]
+        self.previous = current
+
+        # Written under a temporary name first, so a record is either complete or absent
+        record_path = f"{self.path}/deltas/{cycle}.{iteration}.npz"
+        temporary_path = f"{record_path}.tmp"
+        with open(temporary_path, "wb") as record_file:
+            np.savez(record_file, **delta)
+        os.replace(temporary_path, record_path)
+
+    def records(self):
+        """
+        (cycle, iteration) of every recorded graph, in order.
+
+        Returns:
+            records (list):
+                (cycle, iteration) tuples
+        """
+        records = []
+        for file_name in os.listdir(f"{self.path}/deltas"):
+            if file_name.endswith(".npz"):
+                cycle, iteration = file_name[: -len(".npz")].split(".")
+                records.append((int(cycle), int(iteration)))
+        return sorted(records)
+
+    def graph(self, cycle: int, iteration: int):
+        """
+        The graph as it was at a recorded iteration.
+
+        Args:
+            cycle (int):
+                model cycle
+            iteration (int):
+                iteration within the cycle
+
+        Returns:
+            graph (nx.Graph):
+                graph with every node and edge attribute
+        """
+        if (cycle, iteration) not in self.records():
+            raise KeyError(f"iteration {cycle}.{iteration} was not recorded")
+        for record, columns in self.replay():
+            if record == (cycle, iteration):
+                return self.compose_graph(np.load(f"{self.path}/edges.npy"), columns)
+
+    def graphs(self):
+        """
+        Every recorded graph, in order.
+
+        Yields:
+            record (tuple):
+                (cycle, iteration) of the graph
+            graph (nx.Graph):
+                graph with every node and edge attribute
+        """
+        edges = np.load(f"{self.path}/edges.npy")
+        for record, columns in self.replay():
+            yield record, self.compose_graph(edges, columns)
+
+    def replay(self):
+        # Applies each record's changed values to the attribute columns, yielding
+        # the columns after every record without building any graph. The columns
+        # are updated in place, so they are only valid until the next record
+        columns = {"node": {}, "edge": {}}
+        for cycle, iteration in self.records():
+            with np.load(f"{self.path}/deltas/{cycle}.{iteration}.npz") as delta:
+                for key in delta.files:
+                    kind, name, part = key.rsplit("/", 2)
+                    if part != "index":
+                        continue
+                    index, values = delta[key], delta[f"{kind}/{name}/values"]
+                    column = columns[kind].get(name)
+                    if column is None or column.dtype != values.dtype:
+                        column = values.copy()
+                    else:
+                        column[index] = values
+                    columns[kind][name] = column
+            yield (cycle, iteration), columns
+
+    def compose_graph(self, edges, columns):
+        graph = nx.Graph(**self.metadata["graph_attributes"])
+        node_columns = {name: values.tolist() for name, values in columns["node"].items()}
+        graph.add_nodes_from(
+            (node, {name: values[node] for name, values in node_columns.items()})
+            for node in range(0, self.metadata["nodes"])
+        )
+        edge_columns = {name: values.tolist() for name, values in columns["edge"].items()}
+        graph.add_edges_from(
+            (source, target, {name: values[edge] for name, values in edge_columns.items()})
+            for edge, (source, target) in enumerate(edges.tolist())
+        )
+        return graph
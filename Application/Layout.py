@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import networkx as nx
+import numpy as np
+
+
+def mesh_repulsion(positions, kernel_spectra, grid_size):
+    """
+    Sum over all other nodes of (p - q) / |p - q|^2 at each node, approximated
+    on a grid: node masses are spread over their four nearest grid points,
+    convolved with the kernel by FFT and interpolated back the same way.
+
+    Args:
+        positions (ndarray):
+            [node x 2] positions
+        kernel_spectra (tuple):
+            rfft2 of the x and y kernels in grid units, on a 2 * grid_size square
+        grid_size (int):
+            grid points per side
+
+    Returns:
+        repulsion (ndarray):
+            [node x 2] repulsion per unit k^2
+    """
+    low = positions.min(axis=0)
+    cell = max(float((positions.max(axis=0) - low).max()) / (grid_size - 1), 1e-9)
+    scaled = (positions - low) / cell
+    base = np.minimum(np.floor(scaled).astype(np.int64), grid_size - 2)
+    fraction = scaled - base
+    corners = [
+        (0, 0, (1 - fraction[:, 0]) * (1 - fraction[:, 1])),
+        (1, 0, fraction[:, 0] * (1 - fraction[:, 1])),
+        (0, 1, (1 - fraction[:, 0]) * fraction[:, 1]),
+        (1, 1, fraction[:, 0] * fraction[:, 1]),
+    ]
+    cells = [
+        (base[:, 0] + x) * (2 * grid_size) + (base[:, 1] + y) for x, y, _ in corners
+    ]
+
+    density = np.zeros(4 * grid_size * grid_size)
+    for cell_index, (_, _, weight) in zip(cells, corners):
+        density += np.bincount(cell_index, weights=weight, minlength=len(density))
+    density_spectrum = np.fft.rfft2(density.reshape(2 * grid_size, 2 * grid_size))
+
+    repulsion = np.zeros_like(positions)
+    for axis, kernel_spectrum in enumerate(kernel_spectra):
+        # Kernel values scale with 1 / cell size
+        field = np.fft.irfft2(
+            density_spectrum * kernel_spectrum, s=(2 * grid_size, 2 * grid_size)
+        ).ravel() / cell
+        for cell_index, (_, _, weight) in zip(cells, corners):
+            repulsion[:, axis] += field[cell_index] * weight
+    return repulsion
+
+
+def particle_mesh_layout(indptr, indices, seed, k=None, iterations=50, grid_size=256):
+    """
+    Fruchterman-Reingold layout with repulsion computed on a grid.
+
+    Follows nx.spring_layout's scheme (random start in the unit square,
+    nodes moved by a linearly cooling temperature along their net force),
+    but all-pairs repulsion is approximated with a particle-mesh FFT
+    convolution and attraction is summed over edges only, so an iteration
+    costs O(n + m + grid_size^2 log grid_size) rather than O(n^2).
+
+    Args:
+        indptr (ndarray):
+            CSR row pointers, see Graph.compressed_adjacency
+        indices (ndarray):
+            CSR neighbour indices
+        seed (int):
+            seed of the starting positions
+        k (float):
+            optimal distance between nodes, defaults to 1 / sqrt(n)
+        iterations (int):
+            number of iterations
+        grid_size (int):
+            grid points per side of the repulsion mesh
+
+    Returns:
+        positions (ndarray):
+            [node x 2] positions, centred on (0, 0) and scaled to [-1, 1]
+    """
+    num_of_nodes = len(indptr) - 1
+    positions = np.random.default_rng(seed).random((num_of_nodes, 2))
+    if num_of_nodes < 2:
+        return np.zeros((num_of_nodes, 2))
+    if k is None:
+        k = np.sqrt(1.0 / num_of_nodes)
+
+    # Kernel r / |r|^2 at every grid offset, in FFT (wrapped) order
+    offsets = np.fft.fftfreq(2 * grid_size, 1.0 / (2 * grid_size))
+    offset_x, offset_y = np.meshgrid(offsets, offsets, indexing="ij")
+    squared_distance = offset_x ** 2 + offset_y ** 2
+    squared_distance[0, 0] = np.inf
+    kernel_spectra = (
+        np.fft.rfft2(offset_x / squared_distance),
+        np.fft.rfft2(offset_y / squared_distance),
+    )
+
+    sources = np.repeat(np.arange(0, num_of_nodes), np.diff(indptr))
+    temperature = 0.1 * float(np.ptp(positions, axis=0).max())
+    cooling = temperature / (iterations + 1)
+    for _ in range(0, iterations):
+        displacement = (k * k) * mesh_repulsion(positions, kernel_spectra, grid_size)
+        delta = positions[sources] - positions[indices]
+        distance = np.maximum(np.hypot(delta[:, 0], delta[:, 1]), 0.01)
+        attraction = delta * (distance / k)[:, None]
+        for axis in range(0, 2):
+            displacement[:, axis] -= np.bincount(
+                sources, weights=attraction[:, axis], minlength=num_of_nodes
+            )
+        length = np.hypot(displacement[:, 0], displacement[:, 1])
+        length = np.where(length < 0.01, 0.1, length)
+        positions += displacement * (temperature / length)[:, None]
+        temperature -= cooling
+
+    positions -= positions.mean(axis=0)
+    return positions / np.abs(positions).max()
+
+
+class Layout:
+    """
+    Node positions for plotting a graph, cached on disk.
+
+    Graphs up to max_spring_nodes agents are laid out with nx.spring_layout
+    as before; larger ones with particle_mesh_layout, which scales to
+    hundreds of thousands of agents. Positions are stored under a
+    fingerprint of the graph's topology and the layout parameters, so
+    repeated scenarios reuse them instead of recomputing.
+
+    Attributes
+    ----------
+    cache_dir : str
+        directory of cached positions, or None to disable caching
+    k : float
+        optimal distance between nodes for nx.spring_layout
+    iterations : int
+        number of layout iterations
+    max_spring_nodes : int
+        largest graph laid out with nx.spring_layout
+
+    Methods
+    -------
+    positions(graph, seed):
+        Position of every node of the graph, from the cache when possible.
+
+    fingerprint(graph, seed):
+        Cache key of the graph's topology and the layout parameters.
+    """
+
+    # Bump when the algorithms change, so stale positions are not reused
+    version = 1
+
+    def __init__(
+        self,
+        cache_dir: str = None,
+        k: float = 0.5,
+        iterations: int = 50,
+        max_spring_nodes: int = 1000,
+    ):
+        """
+        Constructs essential attributes for the Layout object.
+
+        Args:
+            cache_dir (str):
+                directory of cached positions, or None to disable caching
+            k (float):
+                optimal distance between nodes for nx.spring_layout; larger
+                graphs use particle_mesh_layout's default of 1 / sqrt(n)
+            iterations (int):
+                number of layout iterations
+            max_spring_nodes (int):
+                largest graph laid out with nx.spring_layout
+        """
+        self.cache_dir = cache_dir
+        self.k = k
+        self.iterations = iterations
+        self.max_spring_nodes = max_spring_nodes
+
+    def algorithm(self, graph):
+        if len(graph.graph.nodes) <= self.max_spring_nodes:
+            return "spring"
+        return "particle_mesh"
+
+    def fingerprint(self, graph, seed):
+        """
+        Cache key of the graph's topology and the layout parameters.
+
+        Args:
+            graph (Graph):
+                graph to lay out
+            seed (int):
+                layout seed
+
+        Returns:
+            fingerprint (str):
+                hex digest
+        """
+        indptr, indices, _ = graph.compressed_adjacency()
+        digest = hashlib.sha256()
+        digest.update(
+            json.dumps(
+                [self.version, self.algorithm(graph), self.k, self.iterations, seed]
+            ).encode()
+        )
+        digest.update(np.ascontiguousarray(indptr, dtype=np.int64).tobytes())
+        digest.update(np.ascontiguousarray(indices, dtype=np.int64).tobytes())
+        return digest.hexdigest()
+
+    def positions(self, graph, seed):
+        """
+        Position of every node of the graph, from the cache when possible.
+
+        Args:
+            graph (Graph):
+                graph to lay out
+            seed (int):
+                layout seed
+
+        Returns:
+            coords (dict):
+                position of each node, as returned by nx.spring_layout
+        """
+        cache_path = None
+        if self.cache_dir:
+            cache_path = f"{self.cache_dir}/{self.fingerprint(graph, seed)}.npy"
+            if os.path.exists(cache_path):
+                return dict(enumerate(np.load(cache_path)))
+
+        if self.algorithm(graph) == "spring":
+            coords = nx.spring_layout(
+                graph.graph, k=self.k, iterations=self.iterations, seed=seed
+            )
+            positions = np.array([coords[node] for node in range(0, len(coords))])
+        else:
+            indptr, indices, _ = graph.compressed_adjacency()
+            positions = particle_mesh_layout(
+                indptr, indices, seed, k=None, iterations=self.iterations
+            )
+
+        if cache_path:
+            # Written under a temporary name first, as parallel runs may share the cache
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(temporary_path, "wb") as cache_file:
+                np.save(cache_file, positions)
+            os.replace(temporary_path, cache_path)
+        return dict(enumerate(positions))
@@ -0,0 +1,138 @@
+import collections
+import datetime
+import json
+import threading
+import time
+
+
+class LogSink:
+    """
+    Log that can be written from any thread without waiting on the GUI.
+
+    Messages are appended to an in-memory ring buffer and, optionally, a
+    JSON-lines file. A widget attached on the Tk main thread is updated
+    from the buffer at a fixed rate, with every message since the last
+    update inserted in one batch, and its oldest lines are deleted beyond
+    max_lines. When the widget falls behind by more than capacity
+    messages, the oldest are dropped from it (never from the file) and a
+    note of how many is shown in their place.
+
+    Attributes
+    ----------
+    capacity : int
+        messages held for the widget at most
+    dropped : int
+        messages dropped from the widget so far
+
+    Methods
+    -------
+    insert(index, message):
+        Adds a message, with the signature of a Tk Listbox/Text insert.
+
+    attach(widget, interval, max_lines):
+        Starts updating a Tk widget from the buffer.
+
+    open_file(path):
+        Starts writing messages to a JSON-lines file.
+
+    close_file():
+        Flushes and closes the JSON-lines file.
+    """
+
+    def __init__(self, capacity: int = 10000):
+        """
+        Args:
+            capacity (int):
+                messages held for the widget at most
+        """
+        self.capacity = capacity
+        self.buffer = collections.deque(maxlen=capacity)
+        self.lock = threading.Lock()
+        self.dropped = 0
+        self.file = None
+        self.widget = None
+
+    def insert(self, index, message: str):
+        """
+        Adds a message, with the signature of a Tk Listbox/Text insert so
+        it can stand in for the widget, e.g. as Model's log.
+
+        Args:
+            index (str):
+                ignored, messages are always added at the end
+            message (str):
+                message, usually ending in a newline
+        """
+        with self.lock:
+            if len(self.buffer) == self.capacity:
+                self.dropped += 1
+            self.buffer.append(message)
+            if self.file is not None:
+                record = {
+                    "time": datetime.datetime.now().isoformat(timespec="milliseconds"),
+                    "elapsed": round(time.time() - self.file_opened, 3),
+                    "message": message.strip(),
+                }
+                self.file.write(json.dumps(record) + "\n")
+
+    def attach(self, widget, interval: int = 100, max_lines: int = 2000):
+        """
+        Starts updating a Tk widget from the buffer. Must be called on the
+        Tk main thread.
+
+        Args:
+            widget (tkinter.Listbox):
+                widget messages are inserted into
+            interval (int):
+                milliseconds between updates
+            max_lines (int):
+                lines kept in the widget at most
+        """
+        self.widget = widget
+        self.interval = interval
+        self.max_lines = max_lines
+        self.widget.after(self.interval, self.flush)
+
+    def flush(self):
+        # Runs on the Tk main thread, moving every buffered message into the widget at once
+        with self.lock:
+            messages = list(self.buffer)
+            self.buffer.clear()
+            dropped, self.dropped = self.dropped, 0
+        if dropped or len(messages) > self.max_lines:
+            # The latest messages that fit below a note of how many are not shown
+            kept = min(len(messages), self.max_lines - 1)
+            dropped += len(messages) - kept
+            messages = [
+                f"... {dropped} earlier messages not shown\n",
+                *messages[len(messages) - kept:],
+            ]
+        if messages:
+            self.widget.insert("end", *messages)
+            excess = self.widget.size() - self.max_lines
+            if excess > 0:
+                self.widget.delete(0, excess - 1)
+        self.widget.after(self.interval, self.flush)
+
+    def open_file(self, path: str):
+        """
+        Starts writing messages to a JSON-lines file, one object per
+        message with its time, seconds since the file was opened and text.
+
+        Args:
+            path (str):
+                file path
+        """
+        self.close_file()
+        with self.lock:
+            self.file = open(path, "a", buffering=64 * 1024)
+            self.file_opened = time.time()
+
+    def close_file(self):
+        """
+        Flushes and closes the JSON-lines file.
+        """
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
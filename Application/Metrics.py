@@ -0,0 +1,98 @@
+import numpy as np
+from pandas import DataFrame
+from AgentState import CONDITIONS, FINANCIAL_STATUSES, classify_financial_impact
+
+# Agent values summarised every iteration
+SUMMARISED_COLUMNS = ("current_asset_value", "financial_impact", "time_exposed")
+STATISTICS = ("mean", "variance", "min", "max")
+
+
+class RunMetrics:
+    """
+    Summary statistics of a run's agents, accumulated as the model steps.
+
+    Each update reduces the current agent state to a single row: the mean,
+    variance, minimum and maximum of SUMMARISED_COLUMNS plus the number of
+    agents in each condition and financial status. Only these rows are
+    kept, so charts and counts are available at the end of a run without
+    reading back any per-iteration files.
+
+    Methods
+    -------
+    update(cycle, phase, iteration, columns):
+        Adds a row summarising the given agent state.
+
+    series(column, statistic, phases):
+        Values of one statistic over the run.
+
+    frame():
+        Every row as a DataFrame.
+    """
+
+    def __init__(self):
+        self.rows = []
+
+    def __len__(self):
+        return len(self.rows)
+
+    def update(self, cycle: int, phase: str, iteration: int, columns):
+        """
+        Adds a row summarising the given agent state.
+
+        Args:
+            cycle (int):
+                model cycle
+            phase (str):
+                stage of the model, one of RunStore.PHASES
+            iteration (int):
+                iteration within the phase
+            columns (dict):
+                agent arrays, as given by Model.agent_columns
+        """
+        row = {"cycle": cycle, "phase": phase, "iteration": iteration}
+        for name in SUMMARISED_COLUMNS:
+            values = np.asarray(columns[name], dtype=np.float64)
+            row[f"{name}_mean"] = values.mean()
+            row[f"{name}_variance"] = values.var()
+            row[f"{name}_min"] = values.min()
+            row[f"{name}_max"] = values.max()
+
+        conditions = np.bincount(np.asarray(columns["condition"]), minlength=len(CONDITIONS))
+        for condition, count in zip(CONDITIONS, conditions.tolist()):
+            row[condition] = count
+        statuses = classify_financial_impact(columns["financial_impact"])
+        for status in FINANCIAL_STATUSES:
+            row[status] = int(np.count_nonzero(statuses == status))
+        self.rows.append(row)
+
+    def series(self, column: str, statistic: str, phases=None):
+        """
+        Values of one statistic over the run.
+
+        Args:
+            column (str):
+                one of SUMMARISED_COLUMNS
+            statistic (str):
+                one of STATISTICS
+            phases (tuple):
+                phases to include, all when None
+
+        Returns:
+            values (list):
+                value of each included row, in order
+        """
+        return [
+            row[f"{column}_{statistic}"]
+            for row in self.rows
+            if phases is None or row["phase"] in phases
+        ]
+
+    def frame(self):
+        """
+        Every row as a DataFrame.
+
+        Returns:
+            metrics (DataFrame):
+                one row per update
+        """
+        return DataFrame(self.rows)
@@ -1,30 +1,87 @@
 import collections
 import functools
 import glob
+import json
 import math
 import operator
 import os
-import PIL
 import random
 import time
 import networkx as nx
+import numpy as np
 from Agents import AgentPopulation
+from AgentState import CONDITIONS, AgentState, blended_node_colours
+from Checkpoint import STATE_ARRAYS, Checkpoint, checkpoint_path
+from Engine import FinancialEngine, PandemicEngine
 from Graph import Graph
-from GraphPlot import GraphPlot
-from DataPlot import DataPlot
+from GraphStore import attribute_columns
+from Metrics import RunMetrics
+from Streams import RandomStreams
+
+
+class RunCancelled(Exception):
+    """Raised by Model.auto_run when its cancel Event is set."""
 
 
 class Model:
-    def __init__(self, output_dir: str, options, log = '', mode: str = "automatic"):
+    def __init__(self, output_dir: str, options, log = '', mode: str = "automatic", engine: str = "networkx", rng: str = "legacy", render: bool = True, render_workers: int = None, renderer: str = "bokeh", layout_cache_dir: str = None, animation_formats=("gif",), grid_pixel_budget: int = 4096 * 4096, grid_pages: bool = False, stats_formats=("csv",), graph_format: str = "graphml", checkpoint_every: int = 0, resume: bool = False, progress=None, cancel=None, live=None):
         # reason for not putting datetime here would be to facilitate manual mode
         # this is generated each time the ne model class is inst'd
         # containts dir name, date, time
         self.output_dir = output_dir
         self.log = log
+        # "networkx" steps through node/edge attribute dicts,
+        # "vectorized" resolves each iteration with array operations
+        self.engine = engine
+        # "legacy" reseeds the global generator with (cycle + node) for every draw,
+        # "philox" uses counter-based streams keyed by (seed, cycle, iteration, node)
+        self.rng = rng
+        # False skips network plots, GraphML, GIFs and charts; without an
+        # output_dir nothing is written and only the counts are kept
+        self.render = render
+        # Processes exporting frames in the background, None for one per CPU
+        # and 0 to export each frame before the model steps on
+        self.render_workers = render_workers
+        # "bokeh" exports network frames through a headless browser,
+        # "raster" draws them directly with matplotlib, and "layered" does
+        # so drawing the unchanging edges once per run
+        self.renderer = renderer
+        # Directory node positions are cached in between runs, None to always recompute
+        self.layout_cache_dir = layout_cache_dir
+        # Animations encoded from the network frames: "gif" and optionally "apng"
+        self.animation_formats = animation_formats
+        # Size limit of the grid.png overview, and whether frames beyond it
+        # go on further pages rather than being thinned out
+        self.grid_pixel_budget = grid_pixel_budget
+        self.grid_pages = grid_pages
+        # Agent state output: "csv" writes a node attribute CSV per cycle,
+        # "store" appends every iteration to a columnar RunStore
+        self.stats_formats = stats_formats
+        # Graph output of rendered frames: "graphml" writes the whole graph per frame,
+        # "delta" writes the topology once and the changed attributes per frame
+        self.graph_format = graph_format
+        # Cycles between checkpoints of the run (0 for none), and whether
+        # to continue from the latest checkpoint in output_dir
+        self.checkpoint_every = checkpoint_every
+        self.resume = resume
+        # Called with a progress event after every iteration, e.g. to update a GUI
+        # from another thread, and an Event checked after every iteration that
+        # stops the run with RunCancelled when set
+        self.progress = progress
+        self.cancel = cancel
+        # Called with the layout and then, after every iteration, the colours of the
+        # nodes that changed, for drawing the network live without exporting frames
+        self.live = live
+        self.live_colours = None
+        # Colours that may only appear later in a run, kept in the GIF palette
+        self.frame_colours = ["#00FF00", "#FF0000", "#3A3B3C", "#CCCCCC", "#000000", "#FFFFFF"]
         # this records the time for cycle starts (i think)
         self.latest_run_time = time.strftime("%H:%M:%S")
-        self.create_datetime_output_dir()
-        self.save_model_settings_to_txt(options)
+        self.latest_pandemic_gif = ""
+        self.latest_financial_gif = ""
+        if self.output_dir:
+            self.create_datetime_output_dir()
+            self.save_model_settings_to_txt(options)
         self.enforce_input_value_data_types(options)
     
     def print_to_log(self, message):
@@ -66,13 +123,34 @@ class Model:
         self.financial_lockdown_severity = float(options[2][2])
         self.financial_loan_threshold = float(options[2][3])
 
+        self.streams = RandomStreams(self.seed) if self.rng == "philox" else None
+
     def auto_run(self):
+        self.render_pipeline = None
+        try:
+            self.run_cycles()
+        except BaseException:
+            # A failed or cancelled run renders no further frames, and its
+            # export workers and browsers are shut down rather than left running
+            if self.render_pipeline is not None:
+                self.render_pipeline.cancel()
+            raise
+
+    def run_cycles(self):
         txt_export_path = self.output_dir
-        graphml_export_path = f"{self.output_dir}/graphs"
         plot_export_path = f"{self.output_dir}/plots"
         stats_export_path = f"{self.output_dir}/stats"
-        condition_count_per_iteration = []
-        financial_impact_count_per_iteration = []
+        self.condition_count_per_iteration = []
+        self.financial_impact_count_per_iteration = []
+        self.exported_frames = {"pandemic": [], "financial": []}
+        checkpoint = None
+        if self.resume:
+            checkpoint = self.load_checkpoint()
+        metadata, arrays = checkpoint if checkpoint else ({}, {})
+        start_cycle = metadata.get("cycle", 0)
+        self.start_time = time.time()
+        self.steps_per_cycle = self.pandemic_iterations + self.financial_iterations
+        self.steps_done = self.steps_at_start = start_cycle * self.steps_per_cycle
         
         # if we persist the attribute values of node sizes, it means
         # either financial uses node (degree) sizes of pandemic of vice versa
@@ -80,109 +158,209 @@ class Model:
         # infected_agents = math.floor(self.total_agents/50)
         infected_agents = 1
         agents = AgentPopulation(self.total_agents, infected_agents).agents
-        pandemic = Graph(agents, self.pandemic_cohesion, self.graph_type, self.seed)
-        condition_count_per_iteration.append(
-            self.sum_agent_attributes(pandemic.graph.nodes.data("condition"))
+        # Array engines share a single agent state between both graphs,
+        # so no copying of attributes between graphs is needed
+        state = AgentState(agents) if self.engine == "vectorized" else None
+        pandemic = Graph(
+            agents, self.pandemic_cohesion, self.graph_type, self.seed, state=state,
+            edges=arrays.get("pandemic/edges"),
+        )
+        self.condition_count_per_iteration.append(
+            self.count_agent_attribute(pandemic, "condition")
         )
         financial = Graph(
-            agents, self.financial_cohesion, self.graph_type, self.seed + 1
+            agents, self.financial_cohesion, self.graph_type, self.seed + 1, state=state,
+            edges=arrays.get("financial/edges"),
         )
-        financial.persist_attributes_between_graphs(pandemic.graph)
-        financial_impact_count_per_iteration.append(
-            self.sum_agent_attributes(financial.graph.nodes.data("financial_impact"))
+        if state is None:
+            financial.persist_attributes_between_graphs(pandemic.graph)
+        self.financial_impact_count_per_iteration.append(
+            self.count_agent_attribute(financial, "financial_impact")
         )
 
-        self.print_to_log(f"Conditions: {self.sum_agent_attributes(pandemic.graph.nodes.data('condition'))}")
-        self.print_to_log(f"Impacts: {self.sum_agent_attributes(pandemic.graph.nodes.data('financial_status'))}")
-
-        node_positions = nx.spring_layout(pandemic.graph, k=0.5, seed=self.seed)
-        GraphPlot(
-            title="PANDEMIC MODEL: Cycle 0.0",
-            graph=pandemic,
-            coords=node_positions,
-            export_path=self.concat_plot_write_path(plot_export_path, "network", "pandemic", 0, 0),
-        ).render_and_export_graph()
-        GraphPlot(
-            title="FINANCIAL MODEL: Cycle 0.0",
-            graph=financial, 
-            coords=node_positions,
-            export_path=self.concat_plot_write_path(plot_export_path, "network", "financial", 0, 0),
-        ).render_and_export_graph()
-        pandemic.compose_and_write_csv_of_graph_data(
-            alt_graph=financial.graph, output_path=self.concat_csv_write_path(stats_export_path, 0, 0)
-        )
+        if checkpoint:
+            self.restore_checkpoint(metadata, arrays, pandemic, financial, state)
+            self.print_to_log(f"Resuming after cycle #{start_cycle}")
+        self.print_to_log(f"Conditions: {self.count_agent_attribute(pandemic, 'condition')}")
+        self.print_to_log(f"Impacts: {self.count_agent_attribute(pandemic, 'financial_status')}")
+
+        if self.engine == "vectorized":
+            pandemic_engine = PandemicEngine(pandemic, state)
+            financial_engine = FinancialEngine(financial, state)
+
+        node_positions = None
+        if self.render or self.live is not None:
+            from Layout import Layout
+
+            if "positions" in arrays:
+                node_positions = dict(enumerate(arrays["positions"]))
+            else:
+                node_positions = Layout(cache_dir=self.layout_cache_dir).positions(pandemic, self.seed)
+        if self.live is not None:
+            self.live(
+                {
+                    "event": "layout",
+                    "positions": np.array([node_positions[node] for node in range(0, len(node_positions))]),
+                    "edges": np.array(list(pandemic.graph.edges()), dtype=np.int64).reshape(-1, 2),
+                }
+            )
+
+        if self.render:
+            # The rendering stack (Bokeh, Selenium, matplotlib) is only
+            # imported when needed, so stats-only runs start quickly
+            from Pipeline import RenderPipeline, completed_future
+            from DataPlot import DataPlot
+
+            # Frames are exported by worker processes while the model keeps stepping
+            render_pipeline = RenderPipeline(self.render_workers)
+            self.render_pipeline = render_pipeline
+            # Animations are encoded as frames land rather than after the run
+            self.frame_collectors = {
+                "pandemic": self.create_frame_collector(
+                    f"{plot_export_path}/network/pandemic",
+                    1 + (self.model_cycles * self.pandemic_iterations),
+                ),
+                "financial": self.create_frame_collector(
+                    f"{plot_export_path}/network/financial",
+                    1 + (self.model_cycles * self.financial_iterations),
+                ),
+            }
+            if self.graph_format == "delta":
+                from GraphStore import GraphStore
+
+                self.graph_stores = {
+                    model: GraphStore(f"{self.output_dir}/graphs/{model}", append=True)
+                    if checkpoint
+                    else GraphStore.create(f"{self.output_dir}/graphs/{model}", graph.graph)
+                    for model, graph in (("pandemic", pandemic), ("financial", financial))
+                }
+            if checkpoint:
+                # Frames exported before the checkpoint are encoded again rather than re-rendered
+                for model, paths in metadata["frames"].items():
+                    for export_path in paths:
+                        self.frame_collectors[model].add(completed_future(), export_path)
+                    self.exported_frames[model] = list(paths)
+            else:
+                self.export_frame(render_pipeline, pandemic, node_positions, "pandemic", 0, 0, graphml=False)
+                self.export_frame(render_pipeline, financial, node_positions, "financial", 0, 0, graphml=False)
+        if self.output_dir and "csv" in self.stats_formats and not checkpoint:
+            pandemic.compose_and_write_csv_of_graph_data(
+                alt_graph=financial.graph, output_path=self.concat_csv_write_path(stats_export_path, 0, 0)
+            )
+        if not checkpoint:
+            self.metrics = RunMetrics()
+        run_store = None
+        if self.output_dir and "store" in self.stats_formats:
+            from RunStore import RunStore
+
+            if checkpoint:
+                run_store = RunStore(f"{stats_export_path}/store")
+                run_store.truncate(metadata["run_store_records"])
+            else:
+                run_store = RunStore.create(
+                    f"{stats_export_path}/store", self.static_agent_columns(pandemic, financial)
+                )
+        if not checkpoint:
+            self.record_agent_state(run_store, pandemic, financial, 0, "initial", 0)
 
-        for cycle in range(0, self.model_cycles):
+        for cycle in range(start_cycle, self.model_cycles):
             # self.cycle: Used for generating iterative seed when performing random interaction checks
             self.cycle = cycle
             self.print_to_log(f"  Cycle #{cycle + 1}")
             self.latest_run_time = time.strftime("%H:%M:%S")          
+            if self.engine == "vectorized":
+                pandemic_engine.start_phase()
             for iteration in range(0, self.pandemic_iterations):
                 self.print_to_log(f"\tPandemic Iteration #{cycle + 1}.{iteration + 1}")
-                pandemic.persist_attributes_between_graphs(financial.graph)
-                pandemic.graph = self.run_pandemic_model(
-                    pandemic.graph,
-                    self.pandemic_transmission_rate,
-                    self.pandemic_time_to_recover,
-                )
+                draws = self.transmission_draws(cycle, iteration)
+                if self.engine == "vectorized":
+                    pandemic_engine.step(
+                        self.cycle,
+                        self.pandemic_transmission_rate,
+                        self.pandemic_time_to_recover,
+                        draws=draws,
+                    )
+                else:
+                    # Every iteration starts from the financial graph's attributes,
+                    # i.e. from the agents as they were at the start of the phase
+                    pandemic.sync_from(financial)
+                    changed_nodes = set()
+                    pandemic.graph = self.run_pandemic_model(
+                        pandemic.graph,
+                        self.pandemic_transmission_rate,
+                        self.pandemic_time_to_recover,
+                        changed_nodes=changed_nodes,
+                        draws=draws,
+                        coloured_edges=pandemic.coloured_edges,
+                    )
+                    pandemic.mark_changed_nodes(changed_nodes)
 
-                GraphPlot(
-                    title=f"PANDEMIC MODEL: Cycle {cycle + 1}.{iteration + 1}",
-                    graph=pandemic,
-                    coords=node_positions,
-                    export_path=self.concat_plot_write_path(
-                        plot_export_path, "network", "pandemic", cycle + 1, iteration + 1
-                    ),
-                ).render_and_export_graph()
-                self.write_graph_to_graphml(
-                    pandemic.graph, graphml_export_path, "pandemic", cycle + 1, iteration + 1
+                self.record_agent_state(
+                    run_store, pandemic, financial, cycle + 1, "pandemic", iteration + 1
                 )
-            condition_count_per_iteration.append(
-                self.sum_agent_attributes(pandemic.graph.nodes.data("condition"))
+                self.report_progress(cycle + 1, "pandemic", iteration + 1)
+                if self.render:
+                    self.export_frame(
+                        render_pipeline, pandemic, node_positions, "pandemic", cycle + 1, iteration + 1
+                    )
+            self.condition_count_per_iteration.append(
+                self.count_agent_attribute(pandemic, "condition")
             )
-            self.print_to_log(f"\t  Conditions: {self.sum_agent_attributes(pandemic.graph.nodes.data('condition'))}")
+            self.print_to_log(f"\t  Conditions: {self.count_agent_attribute(pandemic, 'condition')}")
+            if self.engine == "vectorized":
+                financial_engine.start_phase()
             for iteration in range(0, self.financial_iterations):
                 self.current_iteration = iteration + 1
                 self.print_to_log(f"\tFinancial Iteration #{cycle + 1}.{iteration + 1}")
-                financial.persist_attributes_between_graphs(pandemic.graph)
-                financial.graph = self.run_financial_model(
-                    financial.graph,
-                    self.financial_lockdown_severity,
-                    self.financial_loan_threshold,
-                )
-                GraphPlot(
-                    title=f"FINANCIAL MODEL: Cycle {cycle + 1}.{iteration + 1}",
-                    graph=financial,
-                    coords=node_positions,
-                    export_path=self.concat_plot_write_path(
-                        plot_export_path, "network", "financial", cycle + 1, iteration + 1
-                    ),
-                ).render_and_export_graph()
-                self.write_graph_to_graphml(
-                    financial.graph, graphml_export_path, "financial", cycle + 1, iteration + 1
+                if self.engine == "vectorized":
+                    financial_engine.step(
+                        self.financial_lockdown_severity,
+                        self.financial_loan_threshold,
+                    )
+                else:
+                    financial.sync_from(pandemic)
+                    changed_nodes = set()
+                    financial.graph = self.run_financial_model(
+                        financial.graph,
+                        self.financial_lockdown_severity,
+                        self.financial_loan_threshold,
+                        changed_nodes=changed_nodes,
+                    )
+                    financial.mark_changed_nodes(changed_nodes)
+                self.record_agent_state(
+                    run_store, pandemic, financial, cycle + 1, "financial", iteration + 1
                 )
-                financial_impact_count_per_iteration.append(
-                    self.sum_agent_attributes(
-                        financial.graph.nodes.data("financial_impact")
+                self.report_progress(cycle + 1, "financial", iteration + 1)
+                if self.render:
+                    self.export_frame(
+                        render_pipeline, financial, node_positions, "financial", cycle + 1, iteration + 1
                     )
+                self.financial_impact_count_per_iteration.append(
+                    self.count_agent_attribute(financial, "financial_impact")
                 )
-            self.print_to_log(f"\t  Impacts: {self.sum_agent_attributes(pandemic.graph.nodes.data('financial_status'))}")
-            pandemic.compose_and_write_csv_of_graph_data(
-                alt_graph=financial.graph,
-                output_path=self.concat_csv_write_path(stats_export_path, cycle + 1, iteration + 1),
-            )
-        
-        mean_fin_impact_plot = DataPlot(
-            path_to_data=f"{stats_export_path}/graph/node_attributes",
-            export_path=f"{plot_export_path}",
-        ).mean_fin_impact()
+            self.print_to_log(f"\t  Impacts: {self.count_agent_attribute(pandemic, 'financial_status')}")
+            if self.output_dir and "csv" in self.stats_formats:
+                pandemic.compose_and_write_csv_of_graph_data(
+                    alt_graph=financial.graph,
+                    output_path=self.concat_csv_write_path(stats_export_path, cycle + 1, iteration + 1),
+                )
+            if (
+                self.checkpoint_every
+                and (cycle + 1) % self.checkpoint_every == 0
+                and cycle + 1 < self.model_cycles
+            ):
+                self.save_checkpoint(cycle + 1, pandemic, financial, state, run_store, node_positions)
 
-        self.latest_pandemic_gif = self.compose_gif_from_pngs(
-            f"{plot_export_path}/network/pandemic"
-        )
-        self.latest_financial_gif = self.compose_gif_from_pngs(
-            f"{plot_export_path}/network/financial"
-        )
+        if self.render:
+            render_pipeline.close()
+            mean_fin_impact_plot = DataPlot(
+                export_path=f"{plot_export_path}", metrics=self.metrics
+            ).mean_fin_impact()
+
+            for frame_collector in self.frame_collectors.values():
+                frame_collector.close()
+            self.latest_pandemic_gif = f"{plot_export_path}/network/pandemic/model.gif"
+            self.latest_financial_gif = f"{plot_export_path}/network/financial/model.gif"
 
     def concat_csv_write_path(self, stats_dir, cycle, iteration):
         return f"{stats_dir}/graph/node_attributes/{self.latest_run_time}-{cycle}.{iteration}.csv"
@@ -190,57 +368,312 @@ class Model:
     def concat_plot_write_path(self, plot_dir, plot, model, cycle, iteration):
         return f"{plot_dir}/{plot}/{model}/{self.latest_run_time}-{cycle}.{iteration}.png"
 
+    def concat_graphml_write_path(self, graphml_dir, model, cycle, iteration):
+        return f"{graphml_dir}/{model}/{self.latest_run_time}-{cycle}.{iteration}.graphml"
+
     def write_graph_to_graphml(self, graph, graphml_dir, model, cycle, iteration):
         graphml_dir_path = f"{graphml_dir}/{model}"
         os.makedirs(graphml_dir_path, exist_ok=True)
-        graphml_file_path = (
-            f"{graphml_dir_path}/{self.latest_run_time}-{cycle}.{iteration}.graphml"
-        )
+        graphml_file_path = self.concat_graphml_write_path(graphml_dir, model, cycle, iteration)
         nx.write_graphml(G=graph, path=graphml_file_path)
 
+    def export_frame(self, render_pipeline, graph, coords, model, cycle, iteration, graphml=True):
+        # Queues a PNG (and GraphML) export of a snapshot of the graph as it is now
+        from Pipeline import export_frame
+
+        snapshot = graph.snapshot()
+        graphml_path = None
+        if self.graph_format == "delta":
+            # Recorded from the initial graph on, as later records only hold changes
+            self.graph_stores[model].append(cycle, iteration, snapshot.graph)
+        elif graphml:
+            graphml_path = self.concat_graphml_write_path(
+                f"{self.output_dir}/graphs", model, cycle, iteration
+            )
+        export_path = self.concat_plot_write_path(
+            f"{self.output_dir}/plots", "network", model, cycle, iteration
+        )
+        future = render_pipeline.submit(
+            export_frame,
+            f"{model.upper()} MODEL: Cycle {cycle}.{iteration}",
+            snapshot,
+            coords,
+            export_path,
+            graphml_path,
+            self.renderer,
+        )
+        self.frame_collectors[model].add(future, export_path)
+        self.exported_frames[model].append(export_path)
+
+
+    def create_frame_collector(self, path_to_images: str, total_frames: int):
+        # Encodes the model's animations and grid as its frames land
+        from Animation import ApngWriter, ContactSheet, FrameCollector, GifWriter
+
+        writers = [
+            GifWriter(
+                f"{path_to_images}/model.gif",
+                duration=600,
+                loop=0,
+                reserved_colours=self.frame_colours,
+            ),
+            ContactSheet(
+                f"{path_to_images}/grid.png",
+                total_frames,
+                pixel_budget=self.grid_pixel_budget,
+                pages=self.grid_pages,
+            ),
+        ]
+        if "apng" in self.animation_formats:
+            writers.append(ApngWriter(f"{path_to_images}/model.apng", duration=600, loop=0))
+        os.makedirs(path_to_images, exist_ok=True)
+        return FrameCollector(writers)
 
     def compose_gif_from_pngs(self, path_to_images: str):
-        def compose_image_grid_from_frames(images):
-            columns = 3
-            rows = (math.ceil(len(images)/columns))
-            width, height = images[0].size
-            grid = PIL.Image.new('RGB', size = ((columns * width), (rows * height)), color='#FFFFFF')
-            grid_width, grid_height = grid.size
-
-            for x, image in enumerate(images):
-                box = (((x % columns) * width), ((x // columns) * height))
-                grid.paste(image, box = box)
-            return grid
-        
-        frames_in = f"{path_to_images}/*.png"
-        gif_out = f"{path_to_images}/model.gif"
-
-        frame_zero, *frames = [PIL.Image.open(file) for file in sorted(glob.glob(frames_in))]
-        frame_zero.save(
-            fp=gif_out,
-            format="GIF",
-            append_images=frames,
-            save_all=True,
-            duration=600,
-            loop=0,
+        # Re-encodes the animations of already exported frames, one frame at a time
+        import PIL.Image
+
+        frames_in = sorted(glob.glob(f"{path_to_images}/*.png"))
+        frames_in = [frame for frame in frames_in if not os.path.basename(frame).startswith("grid")]
+        frame_collector = self.create_frame_collector(path_to_images, len(frames_in))
+        for frame in frames_in:
+            with PIL.Image.open(frame) as image:
+                for writer in frame_collector.writers:
+                    writer.append(image)
+        frame_collector.close()
+        return f"{path_to_images}/model.gif"
+
+
+    def report_progress(self, cycle, phase, iteration):
+        # Sends a progress event, and stops the run here if it has been cancelled
+        self.steps_done += 1
+        if self.cancel is not None and self.cancel.is_set():
+            raise RunCancelled(f"cancelled in iteration {cycle}.{iteration}")
+        if self.progress is None:
+            return
+        elapsed = time.time() - self.start_time
+        total_steps = self.model_cycles * self.steps_per_cycle
+        steps_this_run = self.steps_done - self.steps_at_start
+        self.progress(
+            {
+                "cycle": cycle,
+                "cycles": self.model_cycles,
+                "phase": phase,
+                "iteration": iteration,
+                "step": self.steps_done,
+                "steps": total_steps,
+                "elapsed": elapsed,
+                "eta": elapsed / steps_this_run * (total_steps - self.steps_done),
+            }
         )
 
-        grid_out = f"{path_to_images}/grid.png"
-        grid = compose_image_grid_from_frames(images = [frame_zero, *frames])
-        grid.save(
-            fp=grid_out,
-            format='PNG'
+    def checkpoint_settings(self):
+        # Settings that determine a run's results, which a resumed run must share
+        return {
+            "options": [
+                [self.total_agents, self.model_cycles, self.graph_type, self.seed],
+                [
+                    self.pandemic_cohesion,
+                    self.pandemic_iterations,
+                    self.pandemic_transmission_rate,
+                    self.pandemic_time_to_recover,
+                ],
+                [
+                    self.financial_cohesion,
+                    self.financial_iterations,
+                    self.financial_lockdown_severity,
+                    self.financial_loan_threshold,
+                ],
+            ],
+            "engine": self.engine,
+            "rng": self.rng,
+            "render": self.render,
+            "renderer": self.renderer,
+            "stats_formats": list(self.stats_formats),
+            "graph_format": self.graph_format,
+            "animation_formats": list(self.animation_formats),
+        }
+
+    def save_checkpoint(self, cycle, pandemic, financial, state, run_store, node_positions):
+        # Captures everything the remaining cycles depend on. Random draws are keyed by
+        # (seed, cycle, iteration, node) in both RNG modes, so no generator state is kept
+        if self.render:
+            # Frames listed in the checkpoint must be on disk before it is written
+            for frame_collector in self.frame_collectors.values():
+                frame_collector.collect(wait=True)
+        arrays = {}
+        graph_attributes = {}
+        for model, graph in (("pandemic", pandemic), ("financial", financial)):
+            graph_attributes[model] = graph.graph.graph
+            arrays[f"{model}/edges"] = np.array(list(graph.graph.edges()), dtype=np.int64).reshape(-1, 2)
+            nodes, edges = graph.graph.nodes, graph.graph.edges
+            for kind, items, names in (
+                ("node", nodes, list(nodes[0]) if len(nodes) else []),
+                ("edge", edges, list(edges[next(iter(edges))]) if len(edges) else []),
+            ):
+                for name, values in attribute_columns(items, names).items():
+                    arrays[f"{model}/{kind}/{name}"] = values
+            arrays[f"{model}/changed_nodes"] = np.array(sorted(graph.changed_nodes), dtype=np.int64)
+            arrays[f"{model}/dirty_nodes"] = np.array(sorted(graph.dirty_nodes), dtype=np.int64)
+        if state is not None:
+            for name in STATE_ARRAYS:
+                arrays[f"state/{name}"] = getattr(state, name)
+        if node_positions is not None:
+            arrays["positions"] = np.array([node_positions[node] for node in range(0, len(node_positions))])
+        metadata = {
+            "version": 1,
+            "cycle": cycle,
+            "settings": self.checkpoint_settings(),
+            "graph_attributes": graph_attributes,
+            "condition_count_per_iteration": self.condition_count_per_iteration,
+            "financial_impact_count_per_iteration": self.financial_impact_count_per_iteration,
+            "metrics": self.metrics.rows,
+            "frames": self.exported_frames,
+            "run_store_records": len(run_store) if run_store is not None else 0,
+        }
+        Checkpoint(checkpoint_path(self.output_dir)).save(metadata, arrays)
+
+    def load_checkpoint(self):
+        # Reads the latest checkpoint, and discards outputs of cycles after it
+        checkpoint = Checkpoint(checkpoint_path(self.output_dir))
+        if not checkpoint.exists():
+            raise FileNotFoundError(f"no checkpoint to resume from in {self.output_dir}")
+        metadata, arrays = checkpoint.load()
+        if metadata["settings"] != json.loads(json.dumps(self.checkpoint_settings())):
+            raise ValueError("settings differ from those of the checkpointed run")
+        for cycle in range(metadata["cycle"] + 1, self.model_cycles + 1):
+            for pattern in (
+                f"{self.output_dir}/plots/network/*/*-{cycle}.*.png",
+                f"{self.output_dir}/graphs/*/*-{cycle}.*.graphml",
+                f"{self.output_dir}/graphs/*/deltas/{cycle}.*.npz",
+                f"{self.output_dir}/stats/graph/node_attributes/*-{cycle}.*.csv",
+            ):
+                for path in glob.glob(pattern):
+                    os.remove(path)
+        return metadata, arrays
+
+    def restore_checkpoint(self, metadata, arrays, pandemic, financial, state):
+        # Puts the agents, graphs and accumulated results back as they were at the checkpoint
+        for model, graph in (("pandemic", pandemic), ("financial", financial)):
+            graph.graph.graph.update(metadata["graph_attributes"][model])
+            edges = list(graph.graph.edges())
+            for key, values in arrays.items():
+                parts = key.split("/")
+                if parts[0] != model or parts[1] not in ("node", "edge"):
+                    continue
+                keys = range(0, len(values)) if parts[1] == "node" else edges
+                attributes = dict(zip(keys, values.tolist()))
+                if parts[1] == "node":
+                    nx.set_node_attributes(graph.graph, attributes, name=parts[2])
+                else:
+                    nx.set_edge_attributes(graph.graph, attributes, name=parts[2])
+            graph.changed_nodes = set(arrays[f"{model}/changed_nodes"].tolist())
+            graph.dirty_nodes = set(arrays[f"{model}/dirty_nodes"].tolist())
+            graph.find_coloured_edges()
+        if state is not None:
+            for name in STATE_ARRAYS:
+                getattr(state, name)[:] = arrays[f"state/{name}"]
+            state.mark_modified(np.arange(0, len(state)))
+        self.condition_count_per_iteration = [
+            [tuple(count) for count in counts] for counts in metadata["condition_count_per_iteration"]
+        ]
+        self.financial_impact_count_per_iteration = [
+            [tuple(count) for count in counts]
+            for counts in metadata["financial_impact_count_per_iteration"]
+        ]
+        self.metrics = RunMetrics()
+        self.metrics.rows = metadata["metrics"]
+
+    def record_agent_state(self, run_store, pandemic, financial, cycle, phase, iteration):
+        # Summarises the agents into the run's metrics, appends them to the run store
+        # and sends them to the live view
+        columns = self.agent_columns(pandemic, financial)
+        self.metrics.update(cycle, phase, iteration, columns)
+        if run_store is not None:
+            run_store.append(cycle, phase, iteration, columns)
+        if self.live is not None:
+            self.send_live_frame(columns, cycle, phase, iteration)
+
+    def send_live_frame(self, columns, cycle, phase, iteration):
+        # Only nodes whose colour changed since the last frame are sent
+        colours = blended_node_colours(columns["condition"], columns["financial_impact"])
+        if self.live_colours is None:
+            nodes = np.arange(0, len(colours))
+        else:
+            nodes = np.flatnonzero(colours != self.live_colours)
+        self.live_colours = colours
+        self.live(
+            {
+                "event": "frame",
+                "model": phase,
+                "cycle": cycle,
+                "iteration": iteration,
+                "nodes": nodes,
+                "colours": colours[nodes],
+            }
         )
 
-        return gif_out
+    def static_agent_columns(self, pandemic, financial):
+        # Agent properties fixed for the run, as arrays for the run store
+        return {
+            "geographic_degree": [degree for _, degree in pandemic.graph.nodes.data("degree")],
+            "financial_degree": [degree for _, degree in financial.graph.nodes.data("degree")],
+            "initial_asset_value": [
+                value for _, value in financial.graph.nodes.data("initial_asset_value")
+            ]
+            if financial.state is None
+            else financial.state.initial_asset_value,
+        }
 
+    def agent_columns(self, pandemic, financial):
+        # Current agent state, as arrays for the run store. Conditions are read
+        # from the pandemic graph and asset values from the financial graph,
+        # as each graph holds the latest values of its own model
+        if pandemic.state is not None:
+            state = pandemic.state
+            return {
+                "condition": state.condition,
+                "time_exposed": state.time_exposed,
+                "current_asset_value": state.current_asset_value,
+                "financial_impact": state.financial_impact,
+            }
+        codes = {condition: code for code, condition in enumerate(CONDITIONS)}
+        return {
+            "condition": [codes[condition] for _, condition in pandemic.graph.nodes.data("condition")],
+            "time_exposed": [time for _, time in pandemic.graph.nodes.data("time_exposed")],
+            "current_asset_value": [
+                value for _, value in financial.graph.nodes.data("current_asset_value")
+            ],
+            "financial_impact": [
+                impact for _, impact in financial.graph.nodes.data("financial_impact")
+            ],
+        }
 
     def sum_agent_attributes(self, attribute):
         counter = collections.Counter([y for (x, y) in attribute])
         return (sorted(counter.items(), key=operator.itemgetter(0)))
 
 
-    def run_pandemic_model(self, graph, transmission_rate, time_to_recover):
+    def transmission_draws(self, cycle, iteration):
+        # All draws for an iteration in one batched call, or None for legacy seeding
+        if self.streams is None:
+            return None
+        return self.streams.transmission_draws(cycle, iteration, self.total_agents)
+
+    def count_agent_attribute(self, graph, attribute):
+        if graph.state is not None:
+            return graph.state.count(attribute)
+        return self.sum_agent_attributes(graph.graph.nodes.data(attribute))
+
+    def run_pandemic_model(self, graph, transmission_rate, time_to_recover, changed_nodes=None, draws=None, coloured_edges=None):
+        # changed_nodes: Collects agents whose condition, time exposed or able_to_recover is modified
+        # draws: Chance of transmission per node, seeded by (cycle + node) when None
+        # coloured_edges: Colour of each edge not in the default colour, kept up to date
+        if changed_nodes is None:
+            changed_nodes = set()
+        if coloured_edges is None:
+            coloured_edges = {}
+
         def update_edge_fill_colour(condition: str):
             return {
                 "susceptible": "#00FF00",
@@ -250,6 +683,7 @@ class Model:
 
         time_before_becoming_contagious = math.ceil(time_to_recover / 5)
         agent_population: int = len(graph.nodes)
+        unable_to_recover = {node for node, able in graph.nodes.data("able_to_recover") if not able}
         graph.add_nodes_from(graph.nodes, able_to_recover=True)
         for agent in range(0, agent_population):
             for edge in graph.edges(agent):
@@ -258,6 +692,9 @@ class Model:
                     graph.edges[edge]["edge_colour"] = update_edge_fill_colour(
                         "default"
                     )
+                    coloured_edges.pop((min(edge), max(edge)), None)
+                    if graph.nodes[source_node]["condition"] != "removed":
+                        changed_nodes.add(source_node)
                     graph.nodes[source_node]["condition"] = "removed"
                     graph.nodes[source_node]["able_to_recover"] = False
 
@@ -267,22 +704,39 @@ class Model:
                         > time_before_becoming_contagious
                     ):
                         if graph.nodes[target_node]["condition"] == "susceptible":
-                            random.seed(self.cycle + target_node)
-                            chance_of_transmission = round(random.random(), 2)
+                            if draws is None:
+                                random.seed(self.cycle + target_node)
+                                chance_of_transmission = round(random.random(), 2)
+                            else:
+                                chance_of_transmission = draws[target_node]
                             if transmission_rate - chance_of_transmission >= 0.00:
                                 graph.edges[edge][
                                     "edge_colour"
                                 ] = update_edge_fill_colour("infectious")
+                                coloured_edges[(min(edge), max(edge))] = update_edge_fill_colour(
+                                    "infectious"
+                                )
                                 graph.nodes[target_node]["condition"] = "infectious"
                                 graph.nodes[target_node]["able_to_recover"] = False
+                                changed_nodes.add(target_node)
                     if graph.nodes[agent]["able_to_recover"]:
                         time_exposed = graph.nodes[agent]["time_exposed"]
                         graph.nodes[agent]["time_exposed"] = time_exposed + 1
                         graph.nodes[agent]["able_to_recover"] = False
+                        changed_nodes.add(agent)
 
+        changed_nodes.update(
+            node
+            for node, able in graph.nodes.data("able_to_recover")
+            if able == (node in unable_to_recover)
+        )
         return graph
 
-    def run_financial_model(self, graph, lockdown_severity, loan_threshold):
+    def run_financial_model(self, graph, lockdown_severity, loan_threshold, changed_nodes=None):
+        # changed_nodes: Collects agents whose asset value or financial impact is modified
+        if changed_nodes is None:
+            changed_nodes = set()
+
         agent_population = len(graph.nodes)
         for agent in range(0, agent_population):
             if graph.nodes[agent]["financial_impact"] != "bust":
@@ -297,6 +751,7 @@ class Model:
                     graph.nodes[agent]["current_asset_value"] = (
                         current_asset_value - reduced_asset_value
                     )
+                    changed_nodes.add(agent)
                 for edge in graph.edges(agent):
                     (source_node, target_node) = edge
                     if (
@@ -326,10 +781,14 @@ class Model:
                                     graph.nodes[source_node][
                                         "current_asset_value"
                                     ] += source_node_bail_out_amount
-                        graph.nodes[source_node]["financial_impact"] = (
+                                    changed_nodes.add(source_node)
+                        financial_impact = (
                             graph.nodes[source_node]["current_asset_value"]
                             / graph.nodes[source_node]["initial_asset_value"]
                         )
+                        if graph.nodes[source_node]["financial_impact"] != financial_impact:
+                            changed_nodes.add(source_node)
+                        graph.nodes[source_node]["financial_impact"] = financial_impact
 
                         if graph.nodes[source_node]["financial_impact"] == "bust":
                             self.log(f"Node {source_node} is bust!")
@@ -0,0 +1,190 @@
+import concurrent.futures
+import os
+import sys
+import threading
+import networkx as nx
+
+
+def plot_class(renderer):
+    # Each backend is only imported when used, so raster runs never load Bokeh
+    if renderer == "raster":
+        from RasterPlot import RasterPlot
+
+        return RasterPlot
+    if renderer == "layered":
+        from RasterPlot import LayeredRasterPlot
+
+        return LayeredRasterPlot
+    from GraphPlot import GraphPlot
+
+    return GraphPlot
+
+
+def completed_future(result=None):
+    # Future of work that has already been done, e.g. a frame exported inline
+    future = concurrent.futures.Future()
+    future.set_result(result)
+    return future
+
+
+def close_plot_resources():
+    # Quits this process's browser if an inline Bokeh export started one;
+    # GraphPlot is looked up rather than imported so Bokeh is never loaded here
+    graph_plot = sys.modules.get("GraphPlot")
+    if graph_plot is not None:
+        graph_plot.WebDriverPool.close()
+
+
+def export_frame(title, graph, coords, export_path, graphml_path=None, renderer="bokeh"):
+    """
+    Renders a graph snapshot to PNG and optionally writes it to GraphML.
+
+    Args:
+        title (str):
+            plot title
+        graph (Graph):
+            detached snapshot of a model graph, see Graph.snapshot
+        coords (dict):
+            node positions
+        export_path (str):
+            PNG file path
+        graphml_path (str):
+            GraphML file path, or None to skip
+        renderer (str):
+            "bokeh" exports through a headless browser, "raster" draws with
+            matplotlib and "layered" does so reusing a cached edge layer
+    """
+    plot_class(renderer)(
+        title=title, graph=graph, coords=coords, export_path=export_path
+    ).render_and_export_graph()
+    if graphml_path:
+        dirs, _ = os.path.split(graphml_path)
+        os.makedirs(dirs, exist_ok=True)
+        nx.write_graphml(G=graph.graph, path=graphml_path)
+
+
+class RenderPipeline:
+    """
+    Bounded queue of frame exports consumed by a pool of worker processes.
+
+    The simulation publishes graph snapshots and carries on stepping while
+    workers render and write them, so a run takes roughly as long as the
+    slower of simulating and rendering. Once max_pending exports are queued
+    or in progress, submit blocks until one finishes, which bounds the
+    number of snapshots held in memory.
+
+    Attributes
+    ----------
+    workers : int
+        number of worker processes, 0 renders inline
+    max_pending : int
+        exports allowed to be queued or in progress at once
+
+    Methods
+    -------
+    submit(function, *args):
+        Queues an export, blocking while the queue is full.
+
+    close():
+        Waits for all queued exports, raises the first error among them
+        and shuts down any browser used for exporting.
+
+    cancel():
+        Drops queued exports and shuts down any browser used for exporting.
+    """
+
+    def __init__(self, workers: int = None, max_pending: int = None):
+        """
+        Starts the worker pool.
+
+        Args:
+            workers (int):
+                number of worker processes, defaults to the number of CPUs;
+                0 renders each export inline as it is submitted
+            max_pending (int):
+                exports allowed to be queued or in progress at once,
+                defaults to twice the number of workers
+        """
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending or max(2 * self.workers, 1)
+        self.slots = threading.BoundedSemaphore(self.max_pending)
+        self.futures = []
+        self.executor = None
+        if self.workers > 0:
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers
+            )
+
+    def submit(self, function, *args):
+        """
+        Queues an export, blocking while the queue is full.
+
+        Args:
+            function (callable):
+                module-level export function, e.g. export_frame
+            *args:
+                picklable arguments of function
+
+        Returns:
+            future (Future):
+                the export, already finished when rendering inline
+        """
+        if self.executor is None:
+            return completed_future(function(*args))
+        self.raise_errors()
+        self.slots.acquire()
+        future = self.executor.submit(function, *args)
+        future.add_done_callback(lambda _: self.slots.release())
+        self.futures.append(future)
+        return future
+
+    def raise_errors(self):
+        # Surfaces failed exports early, and forgets finished ones
+        pending = []
+        for future in self.futures:
+            if not future.done():
+                pending.append(future)
+            elif future.exception() is not None:
+                raise future.exception()
+        self.futures = pending
+
+    def close(self):
+        """
+        Waits for all queued exports, raises the first error among them
+        and shuts down any browser used for exporting.
+        """
+        if self.executor is not None:
+            # Workers quit their browsers as they exit
+            self.executor.shutdown(wait=True)
+            self.executor = None
+            for future in self.futures:
+                future.result()
+            self.futures = []
+        close_plot_resources()
+
+    def cancel(self):
+        """
+        Drops queued exports, waits for those in progress and shuts down
+        any browser used for exporting.
+        """
+        if self.executor is not None:
+            # Futures not yet started are cancelled one by one, as shutdown's
+            # cancel_futures needs Python 3.9
+            for future in self.futures:
+                future.cancel()
+            self.executor.shutdown(wait=True)
+            self.executor = None
+            self.futures = []
+        # Inline exports (no workers) use this process's browser
+        close_plot_resources()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            # Don't render the rest of a failed run
+            self.cancel()
+            return False
+        self.close()
+        return False
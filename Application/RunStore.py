@@ -0,0 +1,232 @@
+import json
+import os
+import numpy as np
+from pandas import DataFrame
+from AgentState import CONDITIONS
+
+# Stage of the model each record was taken after
+PHASES = ("initial", "pandemic", "financial")
+# Agent state recorded every iteration, as [record x agent] arrays
+COLUMNS = {
+    "condition": "int8",
+    "time_exposed": "int32",
+    "current_asset_value": "float64",
+    "financial_impact": "float64",
+}
+# Agent properties that never change during a run, stored once
+STATIC_COLUMNS = {
+    "geographic_degree": "int32",
+    "financial_degree": "int32",
+    "initial_asset_value": "float64",
+}
+
+
+class RunStore:
+    """
+    Columnar, append-only store of a run's agent state.
+
+    Each column is a raw binary file of fixed-width rows, one row per
+    recorded iteration and one value per agent, with conditions
+    dictionary-encoded as indices into CONDITIONS. Recording an iteration
+    appends one row to every file, and reads map the files into memory,
+    so a single iteration or agent's history is a slice that never
+    parses the rest of the run. A metadata.json holds the agent count,
+    column types and condition categories.
+
+    Attributes
+    ----------
+    path : str
+        directory of the store
+    agents : int
+        number of agents per row
+
+    Methods
+    -------
+    create(path, static_columns):
+        Creates an empty store holding the given static columns.
+
+    append(cycle, phase, iteration, columns):
+        Appends one row of agent state.
+
+    truncate(records):
+        Discards every row after the first records.
+
+    index():
+        (cycle, phase, iteration) of every recorded row.
+
+    column(name):
+        [record x agent] array of a column, memory-mapped.
+
+    record(row):
+        Agent state of a single recorded row as a DataFrame.
+
+    agent(agent):
+        History of a single agent as a DataFrame.
+    """
+
+    def __init__(self, path: str):
+        """
+        Opens an existing store.
+
+        Args:
+            path (str):
+                directory of the store
+        """
+        self.path = path
+        with open(f"{path}/metadata.json") as metadata_file:
+            self.metadata = json.load(metadata_file)
+        self.agents = self.metadata["agents"]
+
+    @classmethod
+    def create(cls, path: str, static_columns):
+        """
+        Creates an empty store holding the given static columns.
+
+        Args:
+            path (str):
+                directory of the store, created if needed
+            static_columns (dict):
+                arrays of STATIC_COLUMNS, one value per agent
+
+        Returns:
+            store (RunStore):
+                the new store
+        """
+        os.makedirs(path, exist_ok=True)
+        agents = len(next(iter(static_columns.values())))
+        for name, dtype in STATIC_COLUMNS.items():
+            np.save(f"{path}/{name}.npy", np.asarray(static_columns[name], dtype=dtype))
+        for name in [*COLUMNS, "index"]:
+            open(f"{path}/{name}.bin", "wb").close()
+        metadata = {
+            "version": 1,
+            "agents": agents,
+            "columns": COLUMNS,
+            "static_columns": STATIC_COLUMNS,
+            "categories": {"condition": list(CONDITIONS), "phase": list(PHASES)},
+        }
+        with open(f"{path}/metadata.json", "w") as metadata_file:
+            json.dump(metadata, metadata_file, indent=2)
+        return cls(path)
+
+    def append(self, cycle: int, phase: str, iteration: int, columns):
+        """
+        Appends one row of agent state.
+
+        Args:
+            cycle (int):
+                model cycle
+            phase (str):
+                one of PHASES
+            iteration (int):
+                iteration within the phase
+            columns (dict):
+                arrays of COLUMNS, one value per agent, conditions as codes
+        """
+        for name, dtype in COLUMNS.items():
+            values = np.ascontiguousarray(columns[name], dtype=dtype)
+            if len(values) != self.agents:
+                raise ValueError(f"{name} holds {len(values)} values, expected {self.agents}")
+            with open(f"{self.path}/{name}.bin", "ab") as column_file:
+                column_file.write(values.tobytes())
+        # The index is written last, so a row only counts once every column holds it
+        with open(f"{self.path}/index.bin", "ab") as index_file:
+            index_file.write(
+                np.array([cycle, PHASES.index(phase), iteration], dtype=np.int32).tobytes()
+            )
+
+    def truncate(self, records: int):
+        """
+        Discards every row after the first records, e.g. those of a run
+        resumed from an earlier checkpoint.
+
+        Args:
+            records (int):
+                number of rows to keep
+        """
+        for name, dtype in COLUMNS.items():
+            with open(f"{self.path}/{name}.bin", "r+b") as column_file:
+                column_file.truncate(records * self.agents * np.dtype(dtype).itemsize)
+        with open(f"{self.path}/index.bin", "r+b") as index_file:
+            index_file.truncate(records * 3 * 4)
+
+    def __len__(self):
+        return os.path.getsize(f"{self.path}/index.bin") // (3 * 4)
+
+    def index(self):
+        """
+        (cycle, phase, iteration) of every recorded row.
+
+        Returns:
+            index (DataFrame):
+                one row per record, with phase names
+        """
+        index = np.fromfile(f"{self.path}/index.bin", dtype=np.int32, count=3 * len(self))
+        index = DataFrame(index.reshape(-1, 3), columns=["cycle", "phase", "iteration"])
+        index["phase"] = np.array(PHASES)[index["phase"].to_numpy()]
+        return index
+
+    def column(self, name: str):
+        """
+        [record x agent] array of a column, memory-mapped.
+
+        Args:
+            name (str):
+                one of COLUMNS or STATIC_COLUMNS
+
+        Returns:
+            values (ndarray):
+                read-only view of the column; static columns have one row
+        """
+        if name in STATIC_COLUMNS:
+            return np.load(f"{self.path}/{name}.npy", mmap_mode="r")[np.newaxis, :]
+        records = len(self)
+        if records == 0:
+            return np.empty((0, self.agents), dtype=COLUMNS[name])
+        return np.memmap(
+            f"{self.path}/{name}.bin",
+            dtype=COLUMNS[name],
+            mode="r",
+            shape=(records, self.agents),
+        )
+
+    def record(self, row: int):
+        """
+        Agent state of a single recorded row, in the layout of the node attribute CSVs.
+
+        Args:
+            row (int):
+                position of the record, negative counting from the latest
+
+        Returns:
+            agents (DataFrame):
+                one row per agent
+        """
+        data = {
+            "geographic_degree": self.column("geographic_degree")[0],
+            "financial_degree": self.column("financial_degree")[0],
+            "condition": np.array(CONDITIONS)[self.column("condition")[row]],
+            "time_exposed": self.column("time_exposed")[row],
+            "initial_asset_value": self.column("initial_asset_value")[0],
+            "current_asset_value": self.column("current_asset_value")[row],
+            "financial_impact": self.column("financial_impact")[row],
+        }
+        return DataFrame({name: np.array(values) for name, values in data.items()})
+
+    def agent(self, agent: int):
+        """
+        History of a single agent.
+
+        Args:
+            agent (int):
+                agent (node) index
+
+        Returns:
+            history (DataFrame):
+                one row per record, with its (cycle, phase, iteration)
+        """
+        history = self.index()
+        for name in COLUMNS:
+            history[name] = np.array(self.column(name)[:, agent])
+        history["condition"] = np.array(CONDITIONS)[history["condition"].to_numpy()]
+        return history
@@ -0,0 +1,209 @@
+import collections
+import concurrent.futures
+import glob
+import os
+import numpy as np
+import pandas
+from AgentState import CONDITIONS
+
+# Columns of the node attribute CSVs written by Graph.compose_and_write_csv_of_graph_data
+CSV_DTYPES = {
+    "geographic_degree": "int32",
+    "financial_degree": "int32",
+    "condition": pandas.CategoricalDtype(CONDITIONS),
+    "time_exposed": "int32",
+    "initial_asset_value": "float64",
+    "current_asset_value": "float64",
+    "financial_impact": "float64",
+}
+
+
+def snapshot_key(path: str):
+    # (cycle, iteration) of a node attribute CSV, named <time>-<cycle>.<iteration>.csv
+    cycle, iteration = os.path.basename(path)[: -len(".csv")].rsplit("-", 1)[1].split(".")
+    return int(cycle), int(iteration)
+
+
+def read_snapshot(path: str, columns=None):
+    """
+    Reads the given columns of a node attribute CSV.
+
+    Args:
+        path (str):
+            CSV file path
+        columns (tuple):
+            columns of CSV_DTYPES to read, all when None
+
+    Returns:
+        agents (DataFrame):
+            one row per agent
+    """
+    columns = list(CSV_DTYPES) if columns is None else list(columns)
+    return pandas.read_csv(
+        path,
+        usecols=columns,
+        dtype={column: CSV_DTYPES[column] for column in columns},
+        engine="c",
+    )[columns]
+
+
+def apply_to_snapshot(path, columns, function):
+    snapshot = read_snapshot(path, columns)
+    return snapshot if function is None else function(snapshot)
+
+
+def label_snapshot(frame, run, cycle, iteration):
+    # Prefixes a snapshot's rows with where they came from
+    frame.insert(0, "agent", np.arange(0, len(frame), dtype=np.int32))
+    frame.insert(0, "iteration", iteration)
+    frame.insert(0, "cycle", cycle)
+    frame.insert(0, "run", run)
+    return frame
+
+
+class SnapshotView:
+    """
+    Lazy, concatenated view of the node attribute CSVs of one or more runs.
+
+    Only the file list is gathered up front. Files are read when needed,
+    in a thread pool (the C parser releases the GIL) or optionally a
+    process pool, with only the requested columns and with fixed dtypes.
+    Iterating reads a few files ahead and map() reduces each file as soon
+    as it is read, so summaries over thousands of snapshots never hold
+    all of them in memory; frame() materialises the whole (pruned) view
+    as one DataFrame, and chunks() yields it a bounded number of
+    snapshots at a time.
+
+    Attributes
+    ----------
+    paths : list
+        (run, cycle, iteration, path) of every snapshot, in run order
+    columns : tuple
+        columns read from each snapshot
+    workers : int
+        number of files read in parallel
+
+    Methods
+    -------
+    map(function):
+        Applies a function to every snapshot, in parallel.
+
+    chunks(size):
+        The concatenated view, a few snapshots at a time.
+
+    frame():
+        Every snapshot concatenated into one DataFrame.
+    """
+
+    def __init__(self, dir_paths, columns=None, workers: int = None, processes: bool = False):
+        """
+        Constructs essential attributes for the SnapshotView object.
+
+        Args:
+            dir_paths (str or list):
+                node attribute directories, one per run
+            columns (tuple):
+                columns of CSV_DTYPES to read, all when None
+            workers (int):
+                number of files read in parallel, defaults to the CPU count
+            processes (bool):
+                whether to read in processes rather than threads, in which
+                case functions given to map() must be picklable
+        """
+        if isinstance(dir_paths, str):
+            dir_paths = [dir_paths]
+        self.paths = []
+        for run, dir_path in enumerate(dir_paths):
+            files = sorted(glob.glob(f"{dir_path}/*.csv"), key=snapshot_key)
+            self.paths.extend((run, *snapshot_key(path), path) for path in files)
+        self.columns = tuple(CSV_DTYPES) if columns is None else tuple(columns)
+        self.workers = workers or os.cpu_count() or 1
+        self.processes = processes
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, position: int):
+        return read_snapshot(self.paths[position][-1], self.columns)
+
+    def __iter__(self):
+        # Reads ahead by up to workers files, so only a few snapshots are held at once
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = collections.deque()
+            for *_, path in self.paths:
+                pending.append(executor.submit(read_snapshot, path, self.columns))
+                if len(pending) > self.workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def map(self, function):
+        """
+        Applies a function to every snapshot, in parallel.
+
+        Args:
+            function (callable):
+                called with each snapshot's DataFrame; None keeps the DataFrames
+
+        Returns:
+            results (list):
+                result for each snapshot, in order
+        """
+        executor_class = (
+            concurrent.futures.ProcessPoolExecutor
+            if self.processes
+            else concurrent.futures.ThreadPoolExecutor
+        )
+        paths = [path for *_, path in self.paths]
+        with executor_class(max_workers=self.workers) as executor:
+            return list(
+                executor.map(
+                    apply_to_snapshot,
+                    paths,
+                    [self.columns] * len(paths),
+                    [function] * len(paths),
+                    chunksize=max(1, len(paths) // (4 * self.workers)),
+                )
+            )
+
+    def chunks(self, size: int = 100):
+        """
+        The concatenated view, a few snapshots at a time, reading ahead as
+        iteration does. Only one chunk is held at once, so whole-run
+        summaries can be computed without materialising frame().
+
+        Args:
+            size (int):
+                snapshots per chunk
+
+        Yields:
+            agents (DataFrame):
+                one row per agent per snapshot of the chunk, with its run,
+                cycle, iteration and agent
+        """
+        frames = []
+        for paths, frame in zip(self.paths, self):
+            frames.append(label_snapshot(frame, *paths[:3]))
+            if len(frames) == size:
+                yield pandas.concat(frames, ignore_index=True)
+                frames = []
+        if frames:
+            yield pandas.concat(frames, ignore_index=True)
+
+    def frame(self):
+        """
+        Every snapshot concatenated into one DataFrame. This reads and
+        holds every snapshot at once; use chunks(), map() or iteration
+        for views too large for memory.
+
+        Returns:
+            agents (DataFrame):
+                one row per agent per snapshot, with its run, cycle, iteration and agent
+        """
+        frames = [
+            label_snapshot(frame, run, cycle, iteration)
+            for (run, cycle, iteration, _), frame in zip(self.paths, self.map(None))
+        ]
+        if not frames:
+            return pandas.DataFrame(columns=["run", "cycle", "iteration", "agent", *self.columns])
+        return pandas.concat(frames, ignore_index=True)
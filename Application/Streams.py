@@ -0,0 +1,98 @@
+import numpy as np
+
+
+class RandomStreams:
+    """
+    Counter-based random number streams keyed by (seed, cycle, iteration, node).
+
+    Each (cycle, iteration) pair gets its own Philox key derived from the run
+    seed through a SeedSequence, and the node index is the position within that
+    stream. Draws therefore do not depend on the order in which iterations are
+    run or nodes are visited, and holding no state the streams can be shared
+    with parallel workers.
+
+    Attributes
+    ----------
+    seed : int
+        run seed all stream keys are derived from, which may be negative
+
+    Methods
+    -------
+    generator(cycle, iteration):
+        Philox generator for a single iteration.
+
+    uniform(cycle, iteration, num_of_nodes):
+        One uniform draw in [0, 1) per node for a single iteration.
+
+    transmission_draws(cycle, iteration, num_of_nodes):
+        Chance of transmission per node, rounded as in the pandemic model.
+    """
+
+    def __init__(self, seed: int):
+        """
+        Constructs the streams for a run.
+
+        Args:
+            seed (int):
+                run seed
+        """
+        self.seed = seed
+
+    def generator(self, cycle: int, iteration: int):
+        """
+        Philox generator for a single iteration.
+
+        Args:
+            cycle (int):
+                model cycle
+            iteration (int):
+                iteration within the cycle
+
+        Returns:
+            generator (Generator):
+                generator positioned at the start of the iteration's stream
+        """
+        # SeedSequence only takes non-negative entropy, so negative seeds
+        # are taken as their 64-bit two's complement
+        key = np.random.SeedSequence(
+            entropy=self.seed % 2**64, spawn_key=(cycle, iteration)
+        ).generate_state(2, dtype=np.uint64)
+        return np.random.Generator(np.random.Philox(key=key))
+
+    def uniform(self, cycle: int, iteration: int, num_of_nodes: int):
+        """
+        One uniform draw in [0, 1) per node for a single iteration,
+        generated in one batched call.
+
+        Args:
+            cycle (int):
+                model cycle
+            iteration (int):
+                iteration within the cycle
+            num_of_nodes (int):
+                number of agents
+
+        Returns:
+            draws (ndarray):
+                draw of each node
+        """
+        return self.generator(cycle, iteration).random(num_of_nodes)
+
+    def transmission_draws(self, cycle: int, iteration: int, num_of_nodes: int):
+        """
+        Chance of transmission per node, rounded to two decimal places
+        as in the pandemic model.
+
+        Args:
+            cycle (int):
+                model cycle
+            iteration (int):
+                iteration within the cycle
+            num_of_nodes (int):
+                number of agents
+
+        Returns:
+            draws (ndarray):
+                chance of transmission of each node
+        """
+        return np.round(self.uniform(cycle, iteration, num_of_nodes), 2)
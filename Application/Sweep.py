@@ -0,0 +1,265 @@
+import concurrent.futures
+import csv
+import hashlib
+import itertools
+import json
+import os
+import time
+from pandas import read_csv
+from AgentState import CONDITIONS, FINANCIAL_STATUSES
+from Ensemble import count_vectors
+from Model import Model
+
+# Position and type of each setting within the option lists,
+# as read by Model.enforce_input_value_data_types
+SETTINGS = {
+    "total_agents": (0, 0, int),
+    "model_cycles": (0, 1, int),
+    "graph_type": (0, 2, str),
+    "seed": (0, 3, int),
+    "pandemic_cohesion": (1, 0, float),
+    "pandemic_iterations": (1, 1, int),
+    "pandemic_transmission_rate": (1, 2, float),
+    "pandemic_time_to_recover": (1, 3, int),
+    "financial_cohesion": (2, 0, float),
+    "financial_iterations": (2, 1, int),
+    "financial_lockdown_severity": (2, 2, float),
+    "financial_loan_threshold": (2, 3, float),
+}
+RESULTS = (
+    [f"final_{condition}" for condition in CONDITIONS]
+    + [f"final_{status}" for status in FINANCIAL_STATUSES]
+    + ["peak_infectious", "duration"]
+)
+
+
+def expand_grid(base_options, grid):
+    """
+    Option sets for every combination of the values in grid.
+
+    Args:
+        base_options (list):
+            model options, in the shape Model.enforce_input_value_data_types expects
+        grid (dict):
+            values to sweep, keyed by setting name (see SETTINGS)
+
+    Returns:
+        option_sets (list):
+            one copy of base_options per combination of grid values
+    """
+    option_sets = []
+    for values in itertools.product(*grid.values()):
+        options = [list(option_list) for option_list in base_options]
+        for setting, value in zip(grid.keys(), values):
+            option_list, position, _ = SETTINGS[setting]
+            options[option_list][position] = value
+        option_sets.append(options)
+    return option_sets
+
+
+def settings_of(options):
+    """
+    Typed settings of an option set, keyed by setting name.
+
+    Args:
+        options (list):
+            model options, in the shape Model.enforce_input_value_data_types expects
+
+    Returns:
+        settings (dict):
+            value of each setting in SETTINGS
+    """
+    return {
+        setting: data_type(options[option_list][position])
+        for setting, (option_list, position, data_type) in SETTINGS.items()
+    }
+
+
+def settings_key(settings, engine, rng):
+    # Runs are identified by their settings and what else determines their results
+    return json.dumps([*(settings[setting] for setting in SETTINGS), engine, rng])
+
+
+def default_summary_path(output_dir, option_sets, engine, rng):
+    """
+    Summary CSV of a sweep, named after everything that determines its
+    results, so running the same sweep again resumes it.
+
+    Args:
+        output_dir (str):
+            directory sweeps are written to
+        option_sets (list):
+            option sets of the sweep
+        engine (str):
+            model step engine, see Model
+        rng (str):
+            transmission draw generator, see Model
+
+    Returns:
+        path (str):
+            CSV file path
+    """
+    settings = [settings_of(options) for options in option_sets]
+    digest = hashlib.sha1(
+        json.dumps([settings, engine, rng], sort_keys=True).encode()
+    ).hexdigest()
+    return f"{output_dir}/sweeps/{digest[:12]}.csv"
+
+
+def summarise_run(options, engine="vectorized", rng="legacy"):
+    """
+    Runs the compound model without any output and summarises its final state.
+
+    Args:
+        options (list):
+            model options, in the shape Model.enforce_input_value_data_types expects
+        engine (str):
+            model step engine, see Model
+        rng (str):
+            transmission draw generator, see Model
+
+    Returns:
+        row (dict):
+            settings, engine, rng and results of the run
+    """
+    start_time = time.time()
+    model = Model(output_dir=None, options=options, engine=engine, rng=rng, render=False)
+    model.auto_run()
+    conditions, statuses = count_vectors(
+        model.condition_count_per_iteration,
+        model.financial_impact_count_per_iteration,
+    )
+    row = settings_of(options)
+    row["engine"], row["rng"] = engine, rng
+    for condition, count in zip(CONDITIONS, conditions[-1].tolist()):
+        row[f"final_{condition}"] = count
+    for status, count in zip(FINANCIAL_STATUSES, statuses[-1].tolist()):
+        row[f"final_{status}"] = count
+    row["peak_infectious"] = int(conditions[:, CONDITIONS.index("infectious")].max())
+    row["duration"] = round(time.time() - start_time, 3)
+    return row
+
+
+class Sweep:
+    """
+    Parameter sweep of the compound model, run across worker processes.
+
+    Each finished run is appended to a single summary CSV as soon as it
+    completes. Re-running a sweep against the same summary skips every
+    combination already recorded there, so an interrupted sweep resumes
+    where it stopped. Runs are told apart by their settings, engine and
+    rng. A run that raises is recorded in failures and left out of the
+    summary, without stopping the others, and is retried when the sweep
+    is run again.
+
+    Attributes
+    ----------
+    option_sets : list
+        option sets to run, in the shape Model.enforce_input_value_data_types expects
+    summary_path : str
+        CSV file results are streamed to
+    failures : list
+        (settings, error) of each run that raised in the last call to run()
+
+    Methods
+    -------
+    completed_keys():
+        Keys of the option sets already recorded in the summary.
+
+    run():
+        Runs every option set not yet recorded in the summary.
+    """
+
+    def __init__(
+        self,
+        option_sets,
+        summary_path: str,
+        engine: str = "vectorized",
+        rng: str = "legacy",
+        workers: int = None,
+    ):
+        """
+        Constructs essential attributes for the Sweep object.
+
+        Args:
+            option_sets (list):
+                option sets to run, e.g. from expand_grid
+            summary_path (str):
+                CSV file results are streamed to
+            engine (str):
+                model step engine, see Model
+            rng (str):
+                transmission draw generator, see Model
+            workers (int):
+                number of worker processes, defaults to the number of CPUs
+        """
+        self.option_sets = option_sets
+        self.summary_path = summary_path
+        self.engine = engine
+        self.rng = rng
+        self.workers = workers
+        self.failures = []
+
+    def completed_keys(self):
+        """
+        Keys of the option sets already recorded in the summary.
+
+        Returns:
+            keys (set):
+                settings_key of each completed run
+        """
+        if not os.path.exists(self.summary_path):
+            return set()
+        keys = set()
+        with open(self.summary_path, newline="") as csv_file:
+            for row in csv.DictReader(csv_file):
+                # Rows cut short by an interruption are run again
+                if row.get(RESULTS[-1]) in (None, ""):
+                    continue
+                settings = {
+                    setting: data_type(row[setting])
+                    for setting, (_, _, data_type) in SETTINGS.items()
+                }
+                keys.add(settings_key(settings, row.get("engine"), row.get("rng")))
+        return keys
+
+    def run(self):
+        """
+        Runs every option set not yet recorded in the summary.
+
+        Returns:
+            summary (DataFrame):
+                settings and results of every completed run
+        """
+        completed = self.completed_keys()
+        pending = []
+        for options in self.option_sets:
+            key = settings_key(settings_of(options), self.engine, self.rng)
+            if key not in completed:
+                completed.add(key)
+                pending.append(options)
+
+        dirs, _ = os.path.split(self.summary_path)
+        if dirs:
+            os.makedirs(dirs, exist_ok=True)
+        write_header = not os.path.exists(self.summary_path)
+        with open(self.summary_path, "a", newline="") as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=[*SETTINGS, "engine", "rng", *RESULTS])
+            if write_header:
+                writer.writeheader()
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) as executor:
+                futures = {
+                    executor.submit(summarise_run, options, self.engine, self.rng): options
+                    for options in pending
+                }
+                self.failures = []
+                for future in concurrent.futures.as_completed(futures):
+                    try:
+                        row = future.result()
+                    except Exception as error:
+                        self.failures.append((settings_of(futures[future]), error))
+                        continue
+                    writer.writerow(row)
+                    csv_file.flush()
+
+        return read_csv(self.summary_path)
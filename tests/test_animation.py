@@ -0,0 +1,63 @@
+import numpy as np
+import PIL.Image
+import PIL.ImageSequence
+import pytest
+from Animation import AnimationWriter, ApngWriter, GifWriter
+
+COLOURS = ["#00FF00", "#FF0000", "#3A3B3C", "#CCCCCC", "#000000", "#FFFFFF"]
+
+
+def frames():
+    # Flat-coloured frames using only COLOURS, so a GIF palette holds them exactly;
+    # the third repeats the second and should be merged into it
+    images = []
+    for step, extra in enumerate([0, 1, 1, 2]):
+        pixels = np.full((40, 60, 3), 255, dtype=np.uint8)
+        pixels[5:15, 5 + 10 * extra : 15 + 10 * extra] = (255, 0, 0)
+        pixels[20:30, 10:20] = (0, 255, 0) if step < 3 else (58, 59, 60)
+        images.append(PIL.Image.fromarray(pixels))
+    return images
+
+
+def read_frames(path):
+    with PIL.Image.open(path) as animation:
+        return [
+            (np.asarray(frame.convert("RGB")).copy(), frame.info.get("duration"))
+            for frame in PIL.ImageSequence.Iterator(animation)
+        ]
+
+
+@pytest.mark.parametrize(
+    "writer_class, suffix",
+    [(GifWriter, "gif"), (ApngWriter, "png")],
+)
+def test_writers_round_trip(tmp_path, writer_class, suffix):
+    path = str(tmp_path / f"animation.{suffix}")
+    kwargs = {"reserved_colours": COLOURS} if writer_class is GifWriter else {}
+    images = frames()
+    with writer_class(path, duration=600, **kwargs) as writer:
+        for image in images:
+            writer.append(image)
+    assert writer.frames_written == 3
+
+    decoded = read_frames(path)
+    expected = [images[0], images[1], images[3]]
+    assert len(decoded) == len(expected)
+    for (pixels, _), image in zip(decoded, expected):
+        np.testing.assert_array_equal(pixels, np.asarray(image))
+    assert [duration for _, duration in decoded] == [600, 1200, 600]
+
+
+def test_writer_without_frames_writes_nothing(tmp_path):
+    path = tmp_path / "empty.gif"
+    GifWriter(str(path)).close()
+    assert not path.exists()
+
+
+def test_incomplete_writer_cannot_be_constructed(tmp_path):
+    class HeaderOnly(AnimationWriter):
+        def write_header(self, frame):
+            pass
+
+    with pytest.raises(TypeError):
+        HeaderOnly(str(tmp_path / "animation"))
@@ -0,0 +1,84 @@
+import filecmp
+import glob
+import os
+import time
+import numpy as np
+import pytest
+import Model as model_module
+from GraphStore import GraphStore
+from Model import Model
+
+OPTIONS = [[300, 6, "erdos_renyi", 4], [0.01, 1, 0.9, 3], [0.01, 1, 0.5, 0.5]]
+
+
+def run(output_dir, resume=False, engine="vectorized", render=False):
+    model = Model(
+        output_dir=output_dir,
+        options=OPTIONS,
+        log=None,
+        engine=engine,
+        render=render,
+        render_workers=0,
+        renderer="layered",
+        layout_cache_dir=None,
+        stats_formats=("csv", "store"),
+        graph_format="delta",
+        checkpoint_every=2,
+        resume=resume,
+    )
+    model.auto_run()
+    return model
+
+
+def output_files(root):
+    return sorted(
+        os.path.relpath(path, root)
+        for path in glob.glob(f"{root}/**/*", recursive=True)
+        if os.path.isfile(path) and "/checkpoint/" not in path and "/deltas/" not in path
+    )
+
+
+@pytest.mark.parametrize(
+    "engine, render", [("vectorized", False), ("networkx", False), ("vectorized", True)]
+)
+def test_resumed_run_matches_uninterrupted_run(tmp_path, monkeypatch, engine, render):
+    # Output file names include the time, which must match between the runs
+    monkeypatch.setattr(time, "strftime", lambda *args: "T")
+    uninterrupted, resumed = str(tmp_path / "uninterrupted"), str(tmp_path / "resumed")
+    run(uninterrupted, engine=engine, render=render)
+
+    print_to_log = Model.print_to_log
+
+    def crash(self, message):
+        if "Financial Iteration #5.1" in message:
+            raise RuntimeError("simulated crash")
+        print_to_log(self, message)
+
+    monkeypatch.setattr(model_module.Model, "print_to_log", crash)
+    with pytest.raises(RuntimeError):
+        run(resumed, engine=engine, render=render)
+    monkeypatch.setattr(model_module.Model, "print_to_log", print_to_log)
+    model = run(resumed, resume=True, engine=engine, render=render)
+
+    files = output_files(uninterrupted)
+    assert output_files(resumed) == files
+    different = [
+        path
+        for path in files
+        if not filecmp.cmp(f"{uninterrupted}/{path}", f"{resumed}/{path}", shallow=False)
+    ]
+    assert different == []
+    assert model.metrics.frame().equals(run(str(tmp_path / "again"), engine=engine).metrics.frame())
+
+    if render:
+        for graph in ("pandemic", "financial"):
+            expected = GraphStore(f"{uninterrupted}/graphs/{graph}")
+            actual = GraphStore(f"{resumed}/graphs/{graph}")
+            assert actual.records() == expected.records()
+            for cycle, iteration in expected.records():
+                with np.load(f"{expected.path}/deltas/{cycle}.{iteration}.npz") as expected_delta, np.load(
+                    f"{actual.path}/deltas/{cycle}.{iteration}.npz"
+                ) as actual_delta:
+                    assert sorted(actual_delta.files) == sorted(expected_delta.files)
+                    for key in expected_delta.files:
+                        np.testing.assert_array_equal(actual_delta[key], expected_delta[key])
@@ -0,0 +1,136 @@
+import glob
+import os
+import time
+import numpy as np
+import pandas
+import pytest
+from Graph import Graph
+from Model import Model
+
+# Several iterations per phase, under which every iteration starts over from the agents as they
+# were at the start of the phase. Counts were recorded from the original implementation, which
+# copied all of the other graph's attributes before every iteration
+MULTI_ITERATION_OPTIONS = [[300, 5, "erdos_renyi", 8], [0.01, 3, 0.9, 3], [0.02, 2, 0.5, 0.5]]
+MULTI_ITERATION_CONDITIONS = [
+    [("infectious", 1), ("susceptible", 299)],
+    [("infectious", 4), ("susceptible", 296)],
+    [("infectious", 6), ("susceptible", 294)],
+    [("infectious", 9), ("removed", 1), ("susceptible", 290)],
+    [("infectious", 13), ("removed", 1), ("susceptible", 286)],
+    [("infectious", 20), ("removed", 4), ("susceptible", 276)],
+]
+MULTI_ITERATION_IMPACTS = [
+    [(1.0, 300)],
+    [(0.5, 1), (1.0, 299)],
+    [(0.5, 1), (1.0, 299)],
+    [(0.0, 1), (1.0, 299)],
+    [(0.0, 1), (1.0, 299)],
+    [(0.0, 1), (0.5, 3), (1.0, 296)],
+    [(0.0, 1), (0.5, 3), (1.0, 296)],
+    [(0.0, 4), (0.5, 2), (1.0, 294)],
+    [(0.0, 4), (0.5, 2), (1.0, 294)],
+    [(0.0, 6), (0.5, 4), (1.0, 290)],
+    [(0.0, 6), (0.5, 4), (1.0, 290)],
+]
+
+
+def run_model(options, engine, rng="legacy"):
+    model = Model(output_dir=None, options=options, log=None, engine=engine, rng=rng, render=False)
+    model.auto_run()
+    return model
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        [[300, 6, "erdos_renyi", 3], [0.02, 1, 0.66, 7], [0.02, 1, 0.15, 5.0]],
+        [[300, 6, "erdos_renyi", 8], [0.01, 3, 0.9, 3], [0.02, 2, 0.5, 0.5]],
+        [[500, 5, "sparse_erdos_renyi", 4], [0.01, 2, 0.8, 4], [0.01, 2, 0.3, 2.0]],
+    ],
+)
+@pytest.mark.parametrize("rng", ["legacy", "philox"])
+def test_vectorized_engine_matches_networkx(options, rng):
+    networkx_model = run_model(options, "networkx", rng)
+    vectorized_model = run_model(options, "vectorized", rng)
+
+    assert vectorized_model.condition_count_per_iteration == networkx_model.condition_count_per_iteration
+    assert (
+        vectorized_model.financial_impact_count_per_iteration
+        == networkx_model.financial_impact_count_per_iteration
+    )
+    networkx_metrics = networkx_model.metrics.frame()
+    vectorized_metrics = vectorized_model.metrics.frame()
+    assert list(vectorized_metrics.columns) == list(networkx_metrics.columns)
+    for column in networkx_metrics.columns:
+        if networkx_metrics[column].dtype.kind == "f":
+            np.testing.assert_allclose(vectorized_metrics[column], networkx_metrics[column])
+        else:
+            assert vectorized_metrics[column].tolist() == networkx_metrics[column].tolist()
+
+
+def test_spread_is_not_trivial():
+    # Guards the comparison above against settings under which nothing happens
+    model = run_model([[300, 6, "erdos_renyi", 8], [0.01, 3, 0.9, 3], [0.02, 2, 0.5, 0.5]], "vectorized")
+    final_counts = dict(model.condition_count_per_iteration[-1])
+    assert final_counts.get("susceptible", 0) < 300
+
+
+@pytest.mark.parametrize("engine", ["networkx", "vectorized"])
+def test_several_iterations_match_original_implementation(engine):
+    model = run_model(MULTI_ITERATION_OPTIONS, engine)
+
+    assert model.condition_count_per_iteration == MULTI_ITERATION_CONDITIONS
+    assert model.financial_impact_count_per_iteration == MULTI_ITERATION_IMPACTS
+
+
+def test_changed_node_sync_matches_full_copy(monkeypatch):
+    def record_graphs(states):
+        def record_agent_state(self, run_store, pandemic, financial, *args):
+            states.append(
+                (
+                    dict(pandemic.graph.nodes(data=True)),
+                    dict(financial.graph.nodes(data=True)),
+                    dict(pandemic.coloured_edges),
+                )
+            )
+
+        return record_agent_state
+
+    options = [[200, 4, "erdos_renyi", 1], [0.03, 4, 0.7, 5], [0.03, 3, 0.6, 1.5]]
+    synced = []
+    monkeypatch.setattr(Model, "record_agent_state", record_graphs(synced))
+    run_model(options, "networkx")
+
+    def sync_all_nodes(self, from_graph):
+        self.persist_attributes_between_graphs(from_graph.graph)
+
+    copied = []
+    monkeypatch.setattr(Model, "record_agent_state", record_graphs(copied))
+    monkeypatch.setattr(Graph, "sync_from", sync_all_nodes)
+    run_model(options, "networkx")
+
+    assert len(synced) == 1 + 4 * (4 + 3)
+    assert synced == copied
+
+
+def test_engines_write_the_same_csvs(tmp_path, monkeypatch):
+    monkeypatch.setattr(time, "strftime", lambda *args: "T")
+    options = [[300, 4, "erdos_renyi", 8], [0.01, 2, 0.9, 3], [0.02, 2, 0.5, 0.5]]
+    for engine in ("networkx", "vectorized"):
+        Model(
+            output_dir=str(tmp_path / engine),
+            options=options,
+            log=None,
+            engine=engine,
+            render=False,
+            stats_formats=("csv",),
+        ).auto_run()
+
+    paths = sorted(glob.glob(str(tmp_path / "networkx" / "stats" / "graph" / "node_attributes" / "*.csv")))
+    assert len(paths) == 1 + 4
+    for path in paths:
+        networkx_csv = pandas.read_csv(path)
+        vectorized_csv = pandas.read_csv(tmp_path / "vectorized" / os.path.relpath(path, tmp_path / "networkx"))
+        pandas.testing.assert_frame_equal(vectorized_csv, networkx_csv)
+    # Asset values are those after the cycle's financial iterations
+    assert (networkx_csv["current_asset_value"] < networkx_csv["initial_asset_value"]).any()
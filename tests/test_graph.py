@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from Graph import Graph
+
+
+def test_sparse_erdos_renyi_is_reproducible():
+    first = Graph.generate_sparse_random_edges(2000, 0.004, seed=7)
+    second = Graph.generate_sparse_random_edges(2000, 0.004, seed=7)
+    other = Graph.generate_sparse_random_edges(2000, 0.004, seed=8)
+    for edges, same in zip(first, second):
+        np.testing.assert_array_equal(edges, same)
+    assert not np.array_equal(first[0], other[0]) or not np.array_equal(first[1], other[1])
+
+
+def test_sparse_erdos_renyi_accepts_negative_seeds():
+    sources, targets = Graph.generate_sparse_random_edges(1500, 0.01, seed=-3)
+    assert len(sources) and np.all(sources < targets)
+
+
+def test_sparse_erdos_renyi_edges_are_distinct_ordered_pairs():
+    sources, targets = Graph.generate_sparse_random_edges(1500, 0.01, seed=3)
+    assert np.all(sources < targets)
+    assert targets.max() < 1500
+    pairs = sources * 1500 + targets
+    # Ascending pair order is what graph.edges() yields for the generated graph
+    assert np.all(np.diff(pairs) > 0)
+
+
+@pytest.mark.parametrize("num_of_nodes, cohesion", [(2000, 0.005), (20000, 0.0002), (500, 0.3)])
+def test_sparse_erdos_renyi_edge_count_matches_gnp(num_of_nodes, cohesion):
+    pairs = num_of_nodes * (num_of_nodes - 1) // 2
+    expected = pairs * cohesion
+    standard_deviation = np.sqrt(pairs * cohesion * (1 - cohesion))
+    counts = [
+        len(Graph.generate_sparse_random_edges(num_of_nodes, cohesion, seed)[0])
+        for seed in range(0, 20)
+    ]
+    # Each count within 5 sd, and the mean of 20 within 5 sd / sqrt(20)
+    assert all(abs(count - expected) < 5 * standard_deviation for count in counts)
+    assert abs(np.mean(counts) - expected) < 5 * standard_deviation / np.sqrt(len(counts))
+
+
+@pytest.mark.parametrize("cohesion, edges", [(0.0, 0), (1.0, 4950)])
+def test_sparse_erdos_renyi_extremes(cohesion, edges):
+    sources, _ = Graph.generate_sparse_random_edges(100, cohesion, seed=1)
+    assert len(sources) == edges
+
+
+def test_compressed_adjacency_matches_networkx():
+    from Agents import AgentPopulation
+
+    agents = AgentPopulation(400, 1).agents
+    sparse = Graph(agents, 0.02, "sparse_erdos_renyi", 5)
+    indptr, indices, edge_ids = sparse.compressed_adjacency()
+    edges = list(sparse.graph.edges())
+    for node in range(0, 400):
+        neighbours = indices[indptr[node] : indptr[node + 1]].tolist()
+        assert neighbours == list(sparse.graph.adj[node])
+        for neighbour, edge_id in zip(neighbours, edge_ids[indptr[node] : indptr[node + 1]].tolist()):
+            assert set(edges[edge_id]) == {node, neighbour}
@@ -0,0 +1,72 @@
+import networkx as nx
+import numpy as np
+import pytest
+from AgentState import CONDITIONS
+from GraphStore import GraphStore
+
+
+def step_graph(graph, rng):
+    # Changes a few node and edge attributes, as a model iteration would
+    for node in rng.choice(len(graph.nodes), 5, replace=False).tolist():
+        graph.nodes[node]["condition"] = CONDITIONS[rng.integers(0, len(CONDITIONS))]
+        graph.nodes[node]["financial_impact"] = float(rng.random())
+    edges = list(graph.edges())
+    for edge in rng.choice(len(edges), 3, replace=False).tolist():
+        graph.edges[edges[edge]]["edge_colour"] = "#FF0000"
+
+
+def make_graph():
+    graph = nx.erdos_renyi_graph(60, 0.1, seed=2)
+    nx.set_node_attributes(graph, "susceptible", "condition")
+    nx.set_node_attributes(graph, 1.0, "financial_impact")
+    nx.set_edge_attributes(graph, "#CCCCCC", "edge_colour")
+    return graph
+
+
+def assert_same_graph(replayed, graph):
+    assert dict(replayed.nodes(data=True)) == dict(graph.nodes(data=True))
+    assert list(replayed.edges(data=True)) == list(graph.edges(data=True))
+
+
+def test_graph_store_replays_every_record(tmp_path):
+    rng = np.random.default_rng(2)
+    graph = make_graph()
+    store = GraphStore.create(str(tmp_path / "graphs"), graph)
+    expected = {}
+    for cycle in range(1, 4):
+        for iteration in range(1, 3):
+            step_graph(graph, rng)
+            store.append(cycle, iteration, graph)
+            expected[(cycle, iteration)] = graph.copy()
+
+    store = GraphStore(str(tmp_path / "graphs"))
+    assert store.records() == sorted(expected)
+    for record, replayed in store.graphs():
+        assert_same_graph(replayed, expected[record])
+    assert_same_graph(store.graph(2, 1), expected[(2, 1)])
+    with pytest.raises(KeyError):
+        store.graph(9, 9)
+
+
+def test_graph_store_writes_deltas_after_reopening(tmp_path):
+    rng = np.random.default_rng(3)
+    graph = make_graph()
+    uninterrupted = GraphStore.create(str(tmp_path / "uninterrupted"), graph)
+    resumed = GraphStore.create(str(tmp_path / "resumed"), graph)
+    for cycle in range(1, 5):
+        step_graph(graph, rng)
+        uninterrupted.append(cycle, 1, graph)
+        if cycle == 3:
+            resumed = GraphStore(str(tmp_path / "resumed"), append=True)
+        resumed.append(cycle, 1, graph)
+
+    for cycle in range(1, 5):
+        with np.load(f"{uninterrupted.path}/deltas/{cycle}.1.npz") as expected, np.load(
+            f"{resumed.path}/deltas/{cycle}.1.npz"
+        ) as actual:
+            assert sorted(actual.files) == sorted(expected.files)
+            for key in expected.files:
+                np.testing.assert_array_equal(actual[key], expected[key])
+    with np.load(f"{resumed.path}/deltas/3.1.npz") as delta:
+        # Only the few changed nodes, not a full snapshot
+        assert len(delta["node/condition/index"]) <= 5
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from AgentState import CONDITIONS
+from RunStore import RunStore
+
+
+def agent_columns(rng, agents):
+    return {
+        "condition": rng.integers(0, len(CONDITIONS), agents),
+        "time_exposed": rng.integers(0, 10, agents),
+        "current_asset_value": rng.random(agents) * 100,
+        "financial_impact": rng.random(agents),
+    }
+
+
+def test_run_store_replays_appended_rows(tmp_path):
+    rng = np.random.default_rng(0)
+    agents = 50
+    static = {
+        "geographic_degree": rng.integers(0, 5, agents),
+        "financial_degree": rng.integers(0, 5, agents),
+        "initial_asset_value": rng.random(agents) * 100,
+    }
+    store = RunStore.create(str(tmp_path / "store"), static)
+    rows = [(0, "initial", 0)] + [(cycle, phase, 1) for cycle in (1, 2) for phase in ("pandemic", "financial")]
+    written = []
+    for cycle, phase, iteration in rows:
+        columns = agent_columns(rng, agents)
+        store.append(cycle, phase, iteration, columns)
+        written.append(columns)
+
+    store = RunStore(str(tmp_path / "store"))
+    assert len(store) == len(rows)
+    assert list(store.index().itertuples(index=False, name=None)) == rows
+    for name in written[0]:
+        np.testing.assert_array_equal(store.column(name), np.stack([columns[name] for columns in written]))
+    record = store.record(-1)
+    assert record["condition"].tolist() == [CONDITIONS[code] for code in written[-1]["condition"]]
+    np.testing.assert_array_equal(record["initial_asset_value"], static["initial_asset_value"])
+    history = store.agent(7)
+    assert history["time_exposed"].tolist() == [columns["time_exposed"][7] for columns in written]
+
+    store.truncate(2)
+    assert len(store) == 2
+    np.testing.assert_array_equal(store.column("financial_impact")[1], written[1]["financial_impact"])
+
+
+def test_run_store_rejects_rows_of_the_wrong_size(tmp_path):
+    rng = np.random.default_rng(1)
+    static = {name: np.zeros(10) for name in ("geographic_degree", "financial_degree", "initial_asset_value")}
+    store = RunStore.create(str(tmp_path / "store"), static)
+    with pytest.raises(ValueError):
+        store.append(0, "initial", 0, agent_columns(rng, 9))
@@ -0,0 +1,18 @@
+import numpy as np
+from Streams import RandomStreams
+
+
+def test_draws_are_keyed_by_seed_cycle_and_iteration():
+    draws = RandomStreams(7).uniform(2, 1, 50)
+
+    np.testing.assert_array_equal(RandomStreams(7).uniform(2, 1, 50), draws)
+    np.testing.assert_array_equal(RandomStreams(7).uniform(2, 1, 20), draws[:20])
+    assert not np.array_equal(RandomStreams(7).uniform(2, 2, 50), draws)
+    assert not np.array_equal(RandomStreams(8).uniform(2, 1, 50), draws)
+
+
+def test_negative_seeds():
+    draws = RandomStreams(-7).transmission_draws(0, 1, 50)
+
+    assert ((draws >= 0) & (draws <= 1)).all()
+    assert not np.array_equal(draws, RandomStreams(7).transmission_draws(0, 1, 50))
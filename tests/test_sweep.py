@@ -0,0 +1,22 @@
+from Sweep import Sweep, expand_grid
+
+BASE_OPTIONS = [[60, 2, "erdos_renyi", 1], [0.05, 1, 0.9, 3], [0.05, 1, 0.5, 0.5]]
+
+
+def test_sweep_resumes_runs_of_the_same_engine_and_rng(tmp_path):
+    option_sets = expand_grid(BASE_OPTIONS, {"seed": [1, 2]})
+    summary_path = str(tmp_path / "summary.csv")
+
+    summary = Sweep(option_sets, summary_path, rng="legacy", workers=1).run()
+    assert len(summary) == 2
+    summary = Sweep(option_sets, summary_path, rng="legacy", workers=1).run()
+    assert len(summary) == 2
+    summary = Sweep(option_sets, summary_path, rng="philox", workers=1).run()
+    assert len(summary) == 4
+    assert sorted(zip(summary["seed"], summary["rng"])) == [
+        (1, "legacy"),
+        (1, "philox"),
+        (2, "legacy"),
+        (2, "philox"),
+    ]
+    assert set(summary["engine"]) == {"vectorized"}